@@ -1,17 +1,21 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-import redis.asyncio as aioredis
+from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.db.session import SessionAsync, SessionSync
-from app.helpers.getters import isDebugMode
+from app.db.redis import get_redis_client
 from app.models.user import User
-from app.core.security import SECRET_KEY, ALGORITHM
-from app.core.config import settings
+from app.core.security import ACCESS_SCOPE, decode_token
+from app.schemas.auth import CurrentUser
+from app.schemas.user import UserProfile
+from app.helpers.singleflight import SingleFlight
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Rajadas de requests com o mesmo token compartilham uma única consulta ao banco
+user_lookups = SingleFlight("user")
+
 async def get_db():
     async with SessionAsync() as session:
         yield session
@@ -24,35 +28,57 @@ def get_db_sync():
         db.close()
 
 
-async def get_current_user(
-        token: str = Depends(oauth2_scheme),
-                     db: AsyncSession = Depends(get_db),
-                     ):
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> CurrentUser:
+    """
+    Stateless: trusts a valid, unexpired access token for its (short) lifetime.
+    Revocation via `token_version` is enforced when the token is refreshed.
+    """
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = decode_token(token, ACCESS_SCOPE)
         user_id: str = payload.get("sub")
         tv = payload.get("tv")
         if user_id is None or tv is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    return CurrentUser(id=int(user_id), token_version=int(tv))
 
-    result = await db.execute(select(User).where(User.id == int(user_id)))
+async def get_current_user_db(
+        current: CurrentUser = Depends(get_current_user),
+        db: AsyncSession = Depends(get_db),
+) -> User:
+    """Loads the full `User` row, for endpoints that read or modify it."""
+    result = await db.execute(select(User).where(User.id == current.id))
     user = result.scalar_one_or_none()
-    if not user or int(tv) != int(user.token_version or 1):
-        raise credentials_exception
+    if not user or current.token_version != int(user.token_version or 1):
+        raise _credentials_exception()
     return user
 
+async def _load_user_profile(user_id: int):
+    # Sessão própria: o resultado é compartilhado entre requests (ver SingleFlight)
+    async with SessionAsync() as session:
+        result = await session.execute(
+            select(
+                User.id, User.name, User.email, User.two_factor_enabled,
+                User.current_team_id, User.token_version,
+            ).where(User.id == user_id)
+        )
+        return result.one_or_none()
+
+async def get_current_user_profile(current: CurrentUser = Depends(get_current_user)) -> UserProfile:
+    """Read-only view of the current user; concurrent identical lookups are coalesced."""
+    row = await user_lookups.do(current.id, lambda: _load_user_profile(current.id))
+    if row is None or current.token_version != int(row.token_version or 1):
+        raise _credentials_exception()
+    return UserProfile.model_validate(row, from_attributes=True)
+
 async def get_redis():
-    redis = await aioredis.from_url(
-        settings.CELERY_BROKER_URL_EXTERNAL if isDebugMode() else settings.CELERY_BROKER_URL
-    )
-    try:
-        yield redis
-    finally:
-        await redis.close()
+    # Cliente leve sobre o pool compartilhado (aberto no lifespan); não fecha conexões
+    yield get_redis_client()
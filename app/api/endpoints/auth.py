@@ -2,9 +2,10 @@
     Authentication and Authorization Endpoints
     This module provides API endpoints for user authentication, registration, password reset, and two-factor authentication (2FA) management. It leverages FastAPI for routing, SQLAlchemy for database interactions, and JWT for secure token handling. The endpoints are designed with security best practices, including rate limiting, anti-enumeration measures, and support for out-of-band OTP delivery.
     Endpoints:
-    - /login: Authenticates a user and issues a JWT access token.
-    - /me: Returns the current authenticated user's information and a fresh access token.
-    - /logout: Handles user logout (JWT-based, client-side or via blacklist).
+    - /login: Authenticates a user and issues a short-lived JWT access token and a refresh token.
+    - /refresh: Rotates a refresh token (reuse revokes the whole token family) and issues a new access token.
+    - /me: Returns the current authenticated user's information (tokens are renewed only via /refresh).
+    - /logout: Revokes the refresh-token family; the short-lived access token just expires.
     - /register: Registers a new user, creates a personal team, and issues an access token.
     - /forgot-password/start: Initiates the password reset process by sending an OTP to the user's email.
     - /forgot-password/verify: Verifies the OTP (and optionally TOTP) for password reset and issues a reset session token.
@@ -15,22 +16,26 @@
     - Rate limiting to prevent brute-force and enumeration attacks.
     - Uniform error responses to avoid leaking user existence.
     - OTP and TOTP verification for secure password reset and 2FA.
-    - Token versioning to invalidate old tokens upon password change.
+    - Token versioning to invalidate old tokens upon password change (checked on refresh).
+    - Stateless access tokens: authenticated requests do not hit the database.
     Dependencies:
     - FastAPI, SQLAlchemy, pyotp, jose, custom security and helper modules.
 
 """
+import asyncio
+import logging
+import time
 from datetime import datetime, timedelta, timezone
 from fastapi import APIRouter, Depends, HTTPException, Header, Request, status
 from jose import JWTError, jwt
 import pyotp
 from redis import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import exists, select, update
 
-from app.helpers.getters import isDebugMode
+from app.core.config import config
 from app.helpers.qrcode_generator import generate_qr_code_base64
-from app.schemas.user import UserCreate
+from app.schemas.user import UserCreate, UserProfile
 from app.schemas.auth import (
     Token, 
     Login, 
@@ -38,77 +43,160 @@ from app.schemas.auth import (
     ForgotPasswordVerifyIn, 
     ForgotPasswordVerifyOut, 
     ForgotPasswordConfirmIn, 
-    TwoFASetupOut
+    TwoFASetupOut,
+    RefreshTokenIn,
 )
 
 from app.models.team import Team as TeamModel
-from app.api.dependencies import get_current_user, get_db, get_redis
+from app.api.dependencies import get_current_user_db, get_current_user_profile, get_db, get_redis
 
 from app.models.user import User
 from app.models.password_reset import PasswordReset
+from app.models.refresh_token import RefreshToken
 
 from app.core.security import (
     generate_otp, hash_otp, verify_otp, create_reset_session_token, verify_password,
-    verify_totp, generate_totp_secret, create_access_token, get_password_hash, SECRET_KEY, ALGORITHM
+    verify_totp, generate_totp_secret, create_access_token, get_password_hash, SECRET_KEY, ALGORITHM,
+    create_refresh_token, decode_token, REFRESH_SCOPE, ACCESS_TOKEN_EXPIRE_MINUTES
 )
 from app.helpers.rate_limit import allow
+from app.helpers.idempotency import Replayable, run_idempotent
+from app.helpers import auth_events, email_filter
 from app.mycelery.worker import send_password_otp, send_password_otp_local
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Piso de latência do forgot-password/start, acima do custo do caminho com email existente (bcrypt + insert)
+FORGOT_PASSWORD_MIN_RESPONSE_SEC = config("FORGOT_PASSWORD_MIN_RESPONSE_MS", cast=int, default=500) / 1000
+
+def _issue_tokens(db: AsyncSession, user_id: int, token_version: int, family_id: str | None = None) -> dict:
+    """Creates an access/refresh pair and stages the refresh row; the caller commits."""
+    access_token = create_access_token(data={"sub": str(user_id)}, token_version=token_version)
+    refresh_token, jti, family_id, expires_at = create_refresh_token(user_id, token_version, family_id)
+    db.add(RefreshToken(jti=jti, family_id=family_id, user_id=user_id, expires_at=expires_at))
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+async def _revoke_family(db: AsyncSession, family_id: str):
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.now(timezone.utc))
+    )
+    await db.commit()
 
 @router.post("/login", response_model=Token)
-async def login(login_data: Login, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).filter(User.email == login_data.email))
-    user = result.scalar_one_or_none()
+async def login(
+    login_data: Login,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+):
+    client_ip = request.headers.get("x-forwarded-for", request.client.host)
+    # Só as colunas necessárias (lookup const pelo índice único de email)
+    result = await db.execute(
+        select(User.id, User.password, User.token_version).filter(User.email == login_data.email)
+    )
+    user = result.one_or_none()
     
     if not user or not verify_password(login_data.password, user.password):
+        await auth_events.record(redis, "login", False, user.id if user else None, login_data.email, client_ip)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas")
     
-    access_token = create_access_token(
-        data={"sub": str(user.id)}, 
-        token_version=user.token_version
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    tokens = _issue_tokens(db, user.id, user.token_version)
+    await db.commit()
+    await auth_events.record(redis, "login", True, user.id, login_data.email, client_ip)
+    return tokens
+
+@router.post("/refresh", response_model=Token)
+async def refresh(payload: RefreshTokenIn, db: AsyncSession = Depends(get_db)):
+    invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token inválido")
+    try:
+        claims = decode_token(payload.refresh_token, REFRESH_SCOPE)
+    except JWTError:
+        raise invalid
+
+    # FOR UPDATE serializa refreshes concorrentes do mesmo token
+    result = await db.execute(select(RefreshToken).filter(RefreshToken.jti == claims.get("jti")).with_for_update())
+    rt = result.scalar_one_or_none()
+    if not rt:
+        raise invalid
+
+    if rt.used_at or rt.revoked_at:
+        # Reuso de um token já rotacionado: assume vazamento e revoga a família inteira
+        logger.warning("Refresh token reuse detected", extra={"user_id": rt.user_id, "family_id": rt.family_id})
+        await _revoke_family(db, rt.family_id)
+        raise invalid
+
+    result = await db.execute(select(User.id, User.token_version).filter(User.id == rt.user_id))
+    user = result.one_or_none()
+    if not user or int(claims.get("tv", 0)) != int(user.token_version or 1):
+        await _revoke_family(db, rt.family_id)
+        raise invalid
+
+    rt.used_at = datetime.now(timezone.utc)
+    tokens = _issue_tokens(db, user.id, user.token_version, family_id=rt.family_id)
+    await db.commit()
+    return tokens
 
 @router.get("/me")
-async def read_me(current_user: User = Depends(get_current_user)):
-    access_token = create_access_token(
-        data={"sub": str(current_user.id)}, 
-        token_version=current_user.token_version
-    )
-    return {
-        "user": current_user,
-        "access_token": access_token,
-        "token_type": "bearer"
-    }
+async def read_me(current_user: UserProfile = Depends(get_current_user_profile)):
+    # Não emite access token: renovar só pelo /refresh, onde a família é conferida/revogada
+    return {"user": current_user}
 
 @router.post("/logout")
-async def logout(
-    authorization: str = Header(...),
-    redis: Redis = Depends(get_redis)
-):
-    if isDebugMode():
-        return {"message": "Logout successful"}
-    
-    token = authorization.replace("Bearer ", "")
-    
-    # Decodifica para pegar expiração
-    from jose import jwt
-    payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-    exp = payload["exp"]
-    ttl = exp - int(datetime.now(timezone.utc).timestamp())
-    
-    # Adiciona à blacklist
-    await redis.setex(f"blacklist:{token}", ttl, "revoked")
-    
+async def logout(payload: RefreshTokenIn | None = None, db: AsyncSession = Depends(get_db)):
+    """
+    Revokes the refresh-token family of the session, if one is sent.
+    Access tokens are stateless and are not revoked: they simply expire
+    (ACCESS_TOKEN_EXPIRE_MINUTES), and without the family no new one is issued.
+    """
+    if payload is not None:
+        try:
+            claims = decode_token(payload.refresh_token, REFRESH_SCOPE)
+            await _revoke_family(db, claims["fam"])
+        except JWTError:
+            pass
+
     return {"message": "Logout successful"}
 
 @router.post("/register", response_model=Token)
-async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(select(User).filter(User.email == user.email))
-    db_user = result.scalar_one_or_none()
+async def register(
+    user: UserCreate,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    idempotency_key: str | None = Header(None),
+):
+    # Os tokens não ficam guardados no Redis: o retry recebe um par novo do usuário já criado
+    return await run_idempotent(
+        redis, "register", idempotency_key, user, lambda: _register(user, db, redis),
+        replay=lambda marker: _register_replay(marker, db),
+    )
+
+async def _register_replay(marker: dict, db: AsyncSession):
+    # O fingerprint (HMAC do payload) já provou a mesma senha: sem bcrypt aqui. Se a senha
+    # mudou desde o registro, o token_version também mudou e o replay é recusado
+    token_version = await db.scalar(select(User.token_version).filter(User.id == marker["user_id"]))
+    if token_version is None or token_version != marker["token_version"]:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas")
+    tokens = _issue_tokens(db, marker["user_id"], token_version)
+    await db.commit()
+    return tokens
+
+async def _register(user: UserCreate, db: AsyncSession, redis: Redis):
+    email_taken = False
+    # Ausência certa no filtro dispensa o banco; "talvez" confirma com EXISTS (só no índice único)
+    if await email_filter.might_exist(redis, user.email):
+        email_taken = await db.scalar(select(exists().where(User.email == user.email)))
+        if not email_taken:
+            email_filter.record_false_positive()
     
-    if db_user:
+    if email_taken:
         raise HTTPException(status_code=400, detail="Email já cadastrado")
 
     hashed_password = get_password_hash(user.password)
@@ -124,22 +212,51 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     # Atualiza o usuário com o ID do time criado
     new_user.current_team_id = new_team.id
 
+    # Cria os tokens de acesso/refresh para o novo usuário
+    tokens = _issue_tokens(db, new_user.id, new_user.token_version)
+
+    # Antes do commit: se o commit falhar, fica só um falso positivo inofensivo no filtro
+    await email_filter.add(redis, user.email)
+
     # Efetua o commit de todas as operações
     await db.commit()
-    await db.refresh(new_user)
 
-    # Cria o token de acesso para o novo usuário
-    access_token = create_access_token(data={"sub": str(new_user.id)}, token_version=new_user.token_version)
-    return {"access_token": access_token, "token_type": "bearer"}
+    # De novo após o commit (idempotente): se um rebuild trocou o bitmap entre o add acima
+    # e o commit, o catch-up dele pode não ter visto este usuário
+    await email_filter.add(redis, user.email)
+    # Só o marcador vai para o cache de idempotência; os tokens não ficam no Redis
+    return Replayable(tokens, {"user_id": new_user.id, "token_version": new_user.token_version})
 
 @router.post("/forgot-password/start", status_code=status.HTTP_202_ACCEPTED)
-async def forgot_password_start(payload: ForgotPasswordStartIn, request: Request, db: AsyncSession = Depends(get_db)):
+async def forgot_password_start(
+    payload: ForgotPasswordStartIn,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    idempotency_key: str | None = Header(None),
+):
+    # Retries com a mesma chave não geram outro PasswordReset nem outro email
+    return await run_idempotent(
+        redis, "fp:start", idempotency_key, payload,
+        lambda: _forgot_password_start(payload, request, db, redis),
+        status_code=status.HTTP_202_ACCEPTED,
+    )
+
+async def _forgot_password_start(payload: ForgotPasswordStartIn, request: Request, db: AsyncSession, redis: Redis):
     client_ip = request.headers.get("x-forwarded-for", request.client.host)
     if not allow("fp:start", payload.email, client_ip, max_attempts=5, window_sec=900):
         raise HTTPException(status_code=429, detail="Too many requests")
 
-    result = await db.execute(select(User).filter(User.email == payload.email))
-    user = result.scalar_one_or_none()
+    started = time.monotonic()
+    user = None
+    # Emails certamente inexistentes (bots de enumeração) não chegam ao MySQL
+    if await email_filter.might_exist(redis, payload.email):
+        result = await db.execute(
+            select(User.id, User.two_factor_enabled).filter(User.email == payload.email)
+        )
+        user = result.one_or_none()
+        if user is None:
+            email_filter.record_false_positive()
 
     if user:
         otp = generate_otp()
@@ -156,10 +273,17 @@ async def forgot_password_start(payload: ForgotPasswordStartIn, request: Request
         # Envia OTP de forma assíncrona via Celery
         send_password_otp_local.delay(payload.email, otp)
 
+    # Tempo de resposta uniforme: não revela se o email existe (nem se o filtro acertou)
+    await asyncio.sleep(max(0.0, FORGOT_PASSWORD_MIN_RESPONSE_SEC - (time.monotonic() - started)))
     return {"message": "If the email exists, a verification code has been sent."}
 
 @router.post("/forgot-password/verify", response_model=ForgotPasswordVerifyOut)
-async def forgot_password_verify(payload: ForgotPasswordVerifyIn, request: Request, db: AsyncSession = Depends(get_db)):
+async def forgot_password_verify(
+    payload: ForgotPasswordVerifyIn,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+):
     client_ip = request.headers.get("x-forwarded-for", request.client.host)
     if not allow("fp:verify", payload.email, client_ip, max_attempts=10, window_sec=900):
         raise HTTPException(status_code=429, detail="Too many attempts")
@@ -168,39 +292,51 @@ async def forgot_password_verify(payload: ForgotPasswordVerifyIn, request: Reque
         select(PasswordReset)
         .filter(PasswordReset.email == payload.email, PasswordReset.consumed_at.is_(None))
         .order_by(PasswordReset.id.desc())
+        .limit(1)
     )
     pr = result.scalar_one_or_none()
 
     if not pr or not pr.otp_hash or not pr.otp_expires_at or pr.otp_expires_at < datetime.now(pr.otp_expires_at.tzinfo):
         raise HTTPException(status_code=400, detail="Invalid or expired code")
 
+    # Reserva a tentativa antes de conferir o código (atômico no Redis): palpites em paralelo
+    # não passam todos pelo limite. O writer de auth_events grava o contador em lote no MySQL
+    if not await auth_events.reserve_reset_attempt(redis, pr.id, pr.attempts):
+        raise HTTPException(status_code=400, detail="Invalid or expired code")
+
     if not payload.otp or not verify_otp(payload.otp, pr.otp_hash):
-        pr.attempts += 1
-        await db.commit()
+        await auth_events.record(redis, "reset_otp", False, pr.user_id, payload.email, client_ip)
         raise HTTPException(status_code=400, detail="Invalid or expired code")
 
     pr.otp_verified = True
 
     user = None
     if pr.user_id:
-        result = await db.execute(select(User).filter(User.id == pr.user_id))
-        user = result.scalar_one_or_none()
+        result = await db.execute(
+            select(User.id, User.token_version, User.two_factor_secret).filter(User.id == pr.user_id)
+        )
+        user = result.one_or_none()
     
     if pr.require_totp:
         if not user or not user.two_factor_secret or not payload.totp or not verify_totp(user.two_factor_secret, payload.totp):
-            pr.attempts += 1
-            await db.commit()
+            await auth_events.record(redis, "reset_totp", False, pr.user_id, payload.email, client_ip)
             raise HTTPException(status_code=400, detail="Invalid or missing authenticator code")
         pr.totp_verified = True
 
     pr.reset_session_issued_at = datetime.now(timezone.utc)
     await db.commit()
 
+    await auth_events.record(redis, "reset_verified", True, user.id, payload.email, client_ip)
     rst = create_reset_session_token(user_id=user.id, token_version=user.token_version)
     return ForgotPasswordVerifyOut(reset_session_token=rst)
 
 @router.post("/forgot-password/confirm", status_code=status.HTTP_204_NO_CONTENT)
-async def forgot_password_confirm(payload: ForgotPasswordConfirmIn, request: Request, db: AsyncSession = Depends(get_db)):
+async def forgot_password_confirm(
+    payload: ForgotPasswordConfirmIn,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+):
     auth_header = request.headers.get("authorization", "")
     if not auth_header.lower().startswith("bearer "):
         raise HTTPException(status_code=401, detail="Missing reset session")
@@ -215,14 +351,15 @@ async def forgot_password_confirm(payload: ForgotPasswordConfirmIn, request: Req
         raise HTTPException(status_code=401, detail="Invalid reset session")
 
     user_id = int(claims["sub"])
-    result = await db.execute(select(User).filter(User.id == user_id))
-    user = result.scalar_one_or_none()
-    
-    if not user:
+    # UPDATE direto: não precisa carregar a linha do usuário
+    result = await db.execute(
+        update(User)
+        .where(User.id == user_id)
+        .values(password=get_password_hash(payload.new_password), token_version=User.token_version + 1)
+    )
+    if result.rowcount == 0:
+        await db.rollback()
         raise HTTPException(status_code=401, detail="Invalid reset session")
-
-    user.password = get_password_hash(payload.new_password)
-    user.token_version = (user.token_version or 1) + 1
     await db.commit()
 
     # Marca o reset de senha como consumido
@@ -230,6 +367,7 @@ async def forgot_password_confirm(payload: ForgotPasswordConfirmIn, request: Req
         select(PasswordReset)
         .filter(PasswordReset.user_id == user_id, PasswordReset.consumed_at.is_(None))
         .order_by(PasswordReset.id.desc())
+        .limit(1)
     )
     pr = result.scalar_one_or_none()
     
@@ -237,10 +375,12 @@ async def forgot_password_confirm(payload: ForgotPasswordConfirmIn, request: Req
         pr.consumed_at = datetime.now(timezone.utc)
         await db.commit()
 
+    client_ip = request.headers.get("x-forwarded-for", request.client.host)
+    await auth_events.record(redis, "password_reset", True, user_id, None, client_ip)
     return
 
 @router.post("/2fa/setup", response_model=TwoFASetupOut)
-async def twofa_setup(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def twofa_setup(current_user: User = Depends(get_current_user_db), db: AsyncSession = Depends(get_db)):
     """
     Configura 2FA para o usuário autenticado.
     
@@ -263,7 +403,7 @@ async def twofa_setup(current_user: User = Depends(get_current_user), db: AsyncS
     return TwoFASetupOut(secret=secret, otpauth_url=url, qr_code=qr_code_base64)
 
 @router.post("/2fa/verify", status_code=204)
-async def twofa_verify(code: str, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+async def twofa_verify(code: str, current_user: User = Depends(get_current_user_db), db: AsyncSession = Depends(get_db)):
     if not current_user.two_factor_secret or not verify_totp(current_user.two_factor_secret, code):
         raise HTTPException(status_code=400, detail="Invalid code")
     current_user.two_factor_enabled = True
@@ -0,0 +1,29 @@
+"""
+    Health endpoints for the load balancer / orchestrator.
+    - /healthz: liveness, the process is up and serving.
+    - /readyz: readiness, the lifespan finished pre-warming the pools and the app is
+      not shutting down (a failed warm-up is retried in the background). Reports pool
+      counters from memory; never checks out a connection.
+"""
+from fastapi import APIRouter, Request, Response, status
+
+from app.db.session import db_pool_status
+from app.db.redis import redis_pool_status
+
+router = APIRouter()
+
+@router.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+@router.get("/readyz")
+def readyz(request: Request, response: Response):
+    ready = getattr(request.app.state, "ready", False)
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {
+        "status": "ready" if ready else "not_ready",
+        "warmup": getattr(request.app.state, "warmup", None),
+        "database": db_pool_status(),
+        "redis": redis_pool_status(),
+    }
@@ -1,27 +1,117 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+import base64
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from redis.asyncio import Redis
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.core.config import config
+from app.db.session import SessionAsync
+from app.helpers.idempotency import run_idempotent
+from app.helpers.singleflight import SingleFlight
 from app.models.team import Team
-from app.schemas.team import TeamCreate, TeamOut
-from app.api.dependencies import get_current_user, get_db_sync, get_db
+from app.schemas.team import TeamCreate, TeamOut, TeamSearchOut
+from app.api.dependencies import get_current_user, get_db_sync, get_db, get_redis
 
 router = APIRouter()
 
+team_lookups = SingleFlight("team")
+
+TEAM_SEARCH_CACHE_SEC = config("TEAM_SEARCH_CACHE_SEC", cast=int, default=30)
+
+def _search_cache_key(user_id: int) -> str:
+    # Um hash por usuário: create_team invalida todas as buscas dele com um DEL
+    return f"teams:search:{user_id}"
+
+def _encode_cursor(name: str, team_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([name, team_id]).encode("utf-8")).decode("ascii")
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        name, team_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return str(name), int(team_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+async def _load_team(team_id: int, user_id: int) -> TeamOut | None:
+    async with SessionAsync() as session:
+        result = await session.execute(
+            select(Team.id, Team.name, Team.personal_team).where(Team.id == team_id, Team.user_id == user_id)
+        )
+        row = result.one_or_none()
+    return TeamOut.model_validate(row, from_attributes=True) if row else None
+
 @router.get("/", response_model=list[TeamOut])
 def read_teams(skip: int = 0, limit: int = 10, db: Session = Depends(get_db_sync), current_user = Depends(get_current_user)):
     teams = db.query(Team).filter(Team.user_id == current_user.id).offset(skip).limit(limit).all()
     return teams
 
 @router.post("/", response_model=TeamOut)
-def create_team(team: TeamCreate, db: Session = Depends(get_db_sync), current_user = Depends(get_current_user)):
-    db_team = Team(name=team.name, user_id=current_user.id, personal_team=team.personal_team)
+async def create_team(
+    team: TeamCreate,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    current_user = Depends(get_current_user),
+    idempotency_key: str | None = Header(None),
+):
+    # Um retry com a mesma Idempotency-Key devolve o time já criado em vez de duplicá-lo
+    return await run_idempotent(
+        redis, f"teams:create:{current_user.id}", idempotency_key, team,
+        lambda: _create_team(team, current_user.id, db, redis),
+    )
+
+async def _create_team(team: TeamCreate, user_id: int, db: AsyncSession, redis: Redis) -> TeamOut:
+    db_team = Team(name=team.name, user_id=user_id, personal_team=team.personal_team)
     db.add(db_team)
-    db.commit()
-    db.refresh(db_team)
-    return db_team
+    await db.commit()
+    await redis.delete(_search_cache_key(user_id))
+    return TeamOut.model_validate(db_team)
+
+@router.get("/search", response_model=TeamSearchOut)
+async def search_teams(
+    q: str = Query(..., min_length=1, max_length=50, description="Prefixo do nome do time"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    current_user = Depends(get_current_user),
+):
+    """
+    Busca por prefixo do nome entre os times do usuário, via índice (user_id, name).
+    Paginação por keyset: passe `next_cursor` como `cursor` para a próxima página.
+    """
+    cache_key = _search_cache_key(current_user.id)
+    field = json.dumps([q.lower(), limit, cursor])
+    cached = await redis.hget(cache_key, field)
+    if cached is not None:
+        return TeamSearchOut.model_validate_json(cached)
+
+    escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    stmt = (
+        select(Team.id, Team.name, Team.personal_team)
+        .where(Team.user_id == current_user.id, Team.name.like(f"{escaped}%", escape="\\"))
+        .order_by(Team.name, Team.id)
+        .limit(limit + 1)
+    )
+    if cursor:
+        last_name, last_id = _decode_cursor(cursor)
+        stmt = stmt.where(or_(Team.name > last_name, and_(Team.name == last_name, Team.id > last_id)))
+    rows = (await db.execute(stmt)).all()
+
+    items = [TeamOut.model_validate(row, from_attributes=True) for row in rows[:limit]]
+    next_cursor = _encode_cursor(items[-1].name, items[-1].id) if len(rows) > limit else None
+    page = TeamSearchOut(items=items, next_cursor=next_cursor)
+
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.hset(cache_key, field, page.model_dump_json())
+        pipe.expire(cache_key, TEAM_SEARCH_CACHE_SEC, nx=True)  # TTL não é renovado por novas buscas
+        await pipe.execute()
+    return page
 
 @router.get("/{team_id}", response_model=TeamOut)
-def get_team(team_id: int, db: Session = Depends(get_db_sync), current_user = Depends(get_current_user)):
-    team = db.query(Team).filter(Team.id == team_id, Team.user_id == current_user.id).first()
+async def get_team(team_id: int, current_user = Depends(get_current_user)):
+    key = (team_id, current_user.id)
+    team = await team_lookups.do(key, lambda: _load_team(*key))
     if not team:
         raise HTTPException(status_code=404, detail="Time não encontrado")
     return team
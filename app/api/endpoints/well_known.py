@@ -0,0 +1,29 @@
+"""
+    Well-known endpoints consumed by other services.
+    - /.well-known/jwks.json: public keys (with `kid`) used to sign access tokens,
+      so downstream services can verify tokens locally instead of calling /api/auth/me.
+"""
+import hashlib
+import json
+
+from fastapi import APIRouter, Request, Response
+
+from app.core.config import config
+from app.core.security import keyring
+
+JWKS_CACHE_SECONDS = config("JWKS_CACHE_SECONDS", cast=int, default=300)
+
+router = APIRouter()
+
+@router.get("/.well-known/jwks.json")
+def jwks(request: Request):
+    body = json.dumps(keyring.jwks() if keyring is not None else {"keys": []}, separators=(",", ":"))
+    etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+    headers = {
+        # O próximo kid já é publicado antes de entrar em uso, então um cache curto basta
+        "Cache-Control": f"public, max-age={JWKS_CACHE_SECONDS}, stale-while-revalidate={JWKS_CACHE_SECONDS}",
+        "ETag": etag,
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,160 @@
+# app/api/middleware.py
+"""
+ASGI middlewares da API.
+
+- RequestIdMiddleware: binds a request id (incoming `X-Request-ID` or a new one)
+  to the logging context and echoes it back on the response.
+- ConcurrencyLimitMiddleware: per-route concurrency limits with a bounded wait
+  queue and deadline; excess requests get 503 + `Retry-After` instead of piling
+  up behind bcrypt and the DB pool.
+"""
+import asyncio
+import json
+import math
+import uuid
+
+from prometheus_client import Counter, Gauge
+
+from app.core.log import request_id_var
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+
+class RequestIdMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+requests_shed = Counter(
+    "app_requests_shed_total", "Requests rejected by the concurrency limiter", ["route", "reason"]
+)
+requests_queued = Counter(
+    "app_requests_queued_total", "Requests that had to wait for a concurrency slot", ["route"]
+)
+requests_in_flight = Gauge(
+    "app_requests_in_flight", "Requests holding a concurrency slot", ["route"], multiprocess_mode="livesum"
+)
+requests_waiting = Gauge(
+    "app_requests_waiting", "Requests waiting for a concurrency slot", ["route"], multiprocess_mode="livesum"
+)
+
+
+def parse_concurrency_limits(spec: str) -> dict[str, tuple[int, int, float]]:
+    """
+    Parses `"/api/auth/login=4:16:2,/api/auth/register=2:8:2"` into
+    `{path_prefix: (max_concurrency, max_queue, queue_timeout_sec)}`.
+    """
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        prefix, values = item.split("=", 1)
+        concurrency, queue, timeout = values.split(":")
+        limits[prefix.strip()] = (int(concurrency), int(queue), float(timeout))
+    return limits
+
+
+class _Limiter:
+    def __init__(self, route: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.route = route
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.waiting = 0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    async def acquire(self) -> str | None:
+        """Takes a slot. Returns `None` on success or the shed reason."""
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return None
+        if self.waiting >= self.max_queue:
+            return "queue_full"
+        self.waiting += 1
+        requests_queued.labels(self.route).inc()
+        requests_waiting.labels(self.route).inc()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.queue_timeout)
+            return None
+        except asyncio.TimeoutError:
+            return "queue_timeout"
+        finally:
+            self.waiting -= 1
+            requests_waiting.labels(self.route).dec()
+
+    def release(self):
+        self._slots.release()
+
+
+class ConcurrencyLimitMiddleware:
+    """
+    Limits are per worker process. Routes are matched by the longest configured
+    path prefix; everything else shares the `default` limiter. Paths in `exempt`
+    (health probes, metrics) are never limited.
+    """
+    def __init__(self, app, limits: dict[str, tuple[int, int, float]], default: tuple[int, int, float], exempt: tuple[str, ...] = ()):
+        self.app = app
+        self.exempt = exempt
+        self.limiters = [
+            (prefix, _Limiter(prefix, *values))
+            for prefix, values in sorted(limits.items(), key=lambda item: len(item[0]), reverse=True)
+        ]
+        self.default = _Limiter("default", *default)
+
+    def _limiter_for(self, path: str) -> _Limiter:
+        for prefix, limiter in self.limiters:
+            if path.startswith(prefix):
+                return limiter
+        return self.default
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(self.exempt):
+            return await self.app(scope, receive, send)
+
+        limiter = self._limiter_for(scope["path"])
+        reason = await limiter.acquire()
+        if reason is not None:
+            requests_shed.labels(limiter.route, reason).inc()
+            return await self._reject(limiter, send)
+
+        requests_in_flight.labels(limiter.route).inc()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            requests_in_flight.labels(limiter.route).dec()
+            limiter.release()
+
+    @staticmethod
+    async def _reject(limiter: _Limiter, send):
+        body = json.dumps({"detail": "Servidor sobrecarregado, tente novamente"}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"retry-after", str(max(1, math.ceil(limiter.queue_timeout))).encode("latin-1")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
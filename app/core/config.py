@@ -1,10 +1,24 @@
 import os
 from starlette.config import Config
 import logging
+from app.core.log import setup_logging
 
 envfile=".env"
 config = Config(envfile)
-logging.basicConfig(level=logging.INFO)
+
+LOG_LEVEL: str = config("LOG_LEVEL", default="INFO")
+LOG_JSON: bool = config("LOG_JSON", cast=bool, default=True)
+LOG_ERROR_BURST: int = config("LOG_ERROR_BURST", cast=int, default=10)        # WARNING+ repetidos por janela
+LOG_ERROR_WINDOW_SEC: float = config("LOG_ERROR_WINDOW_SEC", cast=float, default=60.0)
+LOG_QUEUE_SIZE: int = config("LOG_QUEUE_SIZE", cast=int, default=10000)
+
+setup_logging(
+    level=LOG_LEVEL,
+    json_format=LOG_JSON,
+    error_burst=LOG_ERROR_BURST,
+    error_window_sec=LOG_ERROR_WINDOW_SEC,
+    queue_size=LOG_QUEUE_SIZE,
+)
 
 CELERY_BROKER_URL_CASE=""
 CELERY_RESULT_BACKEND_CASE=""
@@ -0,0 +1,163 @@
+# app/core/keys.py
+"""
+Asymmetric signing keys for access tokens, rotated on a fixed schedule.
+
+Time is split into rotation periods of `rotation_days`. Each period has its own
+EC P-256 key, stored as `<keys_dir>/<kid>.pem` where the kid is the key's RFC 7638
+JWK thumbprint, and indexed by `<keys_dir>/period-<period>.kid`. The first worker
+to need a period's key publishes the index atomically; everyone else (every
+replica sharing the directory) reads it. Processes that do not share the
+directory end up with different kids, so a token from one fails on the other as
+an unknown kid instead of a silent signature mismatch. The JWKS publishes the
+previous, current and next keys: tokens signed just before a rotation stay
+verifiable and downstream caches learn the next key before it is used.
+
+usage:\n
+    kid, pem = keyring.signing_key()
+    public_pem = keyring.public_key(kid)
+    keyring.jwks()
+"""
+import base64
+import hashlib
+import json
+import os
+import threading
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_uint(value: int, length: int) -> str:
+    return _b64url(value.to_bytes(length, "big"))
+
+
+def _public_jwk(public_key: ec.EllipticCurvePublicKey) -> dict:
+    numbers = public_key.public_numbers()
+    return {"crv": "P-256", "kty": "EC", "x": _b64url_uint(numbers.x, 32), "y": _b64url_uint(numbers.y, 32)}
+
+
+def thumbprint(public_key: ec.EllipticCurvePublicKey) -> str:
+    """RFC 7638 JWK thumbprint (SHA-256): required members, sorted, no whitespace."""
+    canonical = json.dumps(_public_jwk(public_key), sort_keys=True, separators=(",", ":"))
+    return _b64url(hashlib.sha256(canonical.encode("ascii")).digest())
+
+
+def _write_new(path: str, data: bytes) -> bool:
+    """Publishes `data` at `path` atomically; False if the file already existed."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as fh:
+        fh.write(data)
+    try:
+        # link() é atômico e não sobrescreve: se outro worker publicou primeiro, vale o dele
+        os.link(tmp, path)
+        return True
+    except FileExistsError:
+        return False
+    finally:
+        os.unlink(tmp)
+
+
+class KeyRing:
+    def __init__(self, keys_dir: str, algorithm: str = "ES256", rotation_days: int = 7):
+        if algorithm != "ES256":
+            raise ValueError(f"Unsupported asymmetric algorithm: {algorithm}")
+        self.keys_dir = keys_dir
+        self.algorithm = algorithm
+        self.rotation_sec = max(1, rotation_days) * 24 * 60 * 60
+        self._period: int | None = None
+        self._signing_kid: str | None = None
+        self._private: dict[str, str] = {}   # kid -> private PEM
+        self._public: dict[str, str] = {}    # kid -> public PEM
+        self._jwks: dict = {"keys": []}
+        self._lock = threading.Lock()
+
+    def _path(self, kid: str) -> str:
+        return os.path.join(self.keys_dir, f"{kid}.pem")
+
+    def _index_path(self, period: int) -> str:
+        return os.path.join(self.keys_dir, f"period-{period}.kid")
+
+    def _read_index(self, period: int) -> str | None:
+        try:
+            with open(self._index_path(period), "r", encoding="ascii") as fh:
+                return fh.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _create(self, period: int) -> str:
+        os.makedirs(self.keys_dir, exist_ok=True)
+        key = ec.generate_private_key(ec.SECP256R1())
+        kid = thumbprint(key.public_key())
+        pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        _write_new(self._path(kid), pem)
+        if _write_new(self._index_path(period), kid.encode("ascii")):
+            return kid
+        # Outro worker indexou a chave dele para este período: descarta a nossa
+        os.unlink(self._path(kid))
+        return self._read_index(period)
+
+    def _load_or_create(self, period: int, create: bool) -> tuple[str, ec.EllipticCurvePrivateKey] | None:
+        kid = self._read_index(period)
+        if kid is None:
+            if not create:
+                return None
+            kid = self._create(period)
+        with open(self._path(kid), "rb") as fh:
+            return kid, serialization.load_pem_private_key(fh.read(), password=None)
+
+    def _refresh(self) -> None:
+        period = int(time.time() // self.rotation_sec)
+        if period == self._period:
+            return
+        with self._lock:
+            if period == self._period:
+                return
+            private: dict[str, str] = {}
+            public: dict[str, str] = {}
+            jwks = []
+            signing_kid = None
+            for p in (period - 1, period, period + 1):
+                loaded = self._load_or_create(p, create=p >= period)
+                if loaded is None:
+                    continue
+                kid, key = loaded
+                if p == period:
+                    signing_kid = kid
+                private[kid] = key.private_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PrivateFormat.PKCS8,
+                    serialization.NoEncryption(),
+                ).decode("ascii")
+                public_key = key.public_key()
+                public[kid] = public_key.public_bytes(
+                    serialization.Encoding.PEM,
+                    serialization.PublicFormat.SubjectPublicKeyInfo,
+                ).decode("ascii")
+                jwks.append({**_public_jwk(public_key), "use": "sig", "alg": self.algorithm, "kid": kid})
+            self._private, self._public, self._jwks = private, public, {"keys": jwks}
+            self._signing_kid = signing_kid
+            self._period = period
+
+    def signing_key(self) -> tuple[str, str]:
+        """Returns `(kid, private_pem)` of the key active in the current period."""
+        self._refresh()
+        kid = self._signing_kid
+        return kid, self._private[kid]
+
+    def public_key(self, kid: str) -> str | None:
+        self._refresh()
+        return self._public.get(kid)
+
+    def jwks(self) -> dict:
+        self._refresh()
+        return self._jwks
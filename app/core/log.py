@@ -0,0 +1,228 @@
+# app/core/log.py
+"""
+Non-blocking, structured logging pipeline shared by the API and the Celery workers.
+
+- Every logger writes to a `QueueHandler`; the real handlers (stdout) run on a
+  background thread owned by a `QueueListener`, so request/task code never
+  blocks on the container log driver.
+- Records are rendered as one JSON object per line and carry the current
+  `request_id` (HTTP request or Celery task).
+- Repetitive WARNING+ records are rate limited per call site: after `burst`
+  records inside `window_sec` the rest are dropped and the next emitted record
+  reports how many were suppressed.
+- When the queue is full records are dropped instead of blocking; the next
+  record that gets through reports how many were lost (`dropped`).
+
+usage:\n
+    from app.core.log import setup_logging, request_id_var
+    setup_logging(level="INFO")
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+request_id_var: ContextVar[str | None] = ContextVar("request_id", default=None)
+
+# Loggers that configure their own (synchronous) handlers and must be routed
+# through the queue as well.
+_CAPTURED_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access", "celery", "celery.task")
+
+_RESERVED_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "suppressed", "dropped"}
+
+_listener: QueueListener | None = None
+_lock = threading.Lock()
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps each record with the request id bound to the current context."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most `burst` records per call site through every `window_sec`.
+    Only applies to records at or above `min_level`; lower levels pass untouched.
+    """
+    def __init__(self, burst: int = 10, window_sec: float = 60.0, min_level: int = logging.WARNING):
+        super().__init__()
+        self.burst = burst
+        self.window_sec = window_sec
+        self.min_level = min_level
+        self._buckets: dict[tuple, list] = {}  # key -> [window_start, emitted, suppressed]
+        self._pruned_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        # A chave inclui a mensagem: f-strings de libs de terceiros geram chaves sem fim.
+        # Janelas vencidas saem; as com supressões pendentes esperam mais uma janela para reportar.
+        self._pruned_at = now
+        for key, bucket in list(self._buckets.items()):
+            age = now - bucket[0]
+            if age >= self.window_sec and (not bucket[2] or age >= 2 * self.window_sec):
+                del self._buckets[key]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < self.min_level or self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            if now - self._pruned_at >= self.window_sec:
+                self._prune(now)
+            bucket = self._buckets.get(key)
+            if bucket is None or now - bucket[0] >= self.window_sec:
+                suppressed = bucket[2] if bucket else 0
+                self._buckets[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            if bucket[1] < self.burst:
+                bucket[1] += 1
+                return True
+            bucket[2] += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    """Renders a record as a single-line JSON object."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "process": record.process,
+        }
+        if getattr(record, "suppressed", None):
+            entry["suppressed"] = record.suppressed
+        if getattr(record, "dropped", None):
+            entry["dropped"] = record.dropped
+        # Campos extras passados via `logger.info(..., extra={...})`
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class _EnqueueHandler(QueueHandler):
+    """
+    QueueHandler that keeps the record intact (extras, exc_info as text) instead
+    of pre-formatting it, so the listener-side formatter still sees every field.
+    When the queue is full the record is dropped instead of blocking the caller;
+    the count rides on the next record that fits.
+    """
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        dropped = self.dropped
+        if dropped:
+            record.dropped = dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+        else:
+            self.dropped -= dropped
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(
+    level: str | int = "INFO",
+    json_format: bool = True,
+    error_burst: int = 10,
+    error_window_sec: float = 60.0,
+    queue_size: int = 10000,
+) -> QueueListener:
+    """
+    Installs the queue-based pipeline on the root logger. Idempotent: calling it
+    again (e.g. from the Celery `setup_logging` signal) returns the running listener.
+    """
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        stream = logging.StreamHandler(sys.stdout)
+        if json_format:
+            stream.setFormatter(JsonFormatter())
+        else:
+            stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+
+        log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        enqueue = _EnqueueHandler(log_queue)
+        enqueue.addFilter(RequestIdFilter())
+        enqueue.addFilter(RateLimitFilter(burst=error_burst, window_sec=error_window_sec))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(enqueue)
+        root.setLevel(level)
+
+        for name in _CAPTURED_LOGGERS:
+            captured = logging.getLogger(name)
+            for handler in list(captured.handlers):
+                captured.removeHandler(handler)
+            captured.propagate = True
+
+        _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging() -> None:
+    """Flushes the queue and stops the background thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_after_fork() -> None:
+    """
+    The listener thread does not survive `fork()` (Celery prefork pool, uvicorn
+    workers): give the child a fresh queue and its own listener thread.
+    """
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _listener is None:
+        return
+    handlers = _listener.handlers
+    log_queue: queue.Queue = queue.Queue(maxsize=_listener.queue.maxsize)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, _EnqueueHandler):
+            handler.queue = log_queue
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,38 @@
+# app/core/metrics.py
+"""
+Prometheus metrics shared by the API and the Celery workers.
+
+Metric objects are declared next to the code that updates them; this module only
+owns the exposition. With several uvicorn/Celery processes, set
+`PROMETHEUS_MULTIPROC_DIR` to a shared, empty directory so `/metrics` aggregates
+every process instead of reporting only the one that served the scrape.
+
+usage:\n
+    from prometheus_client import Counter
+    shed = Counter("app_requests_shed_total", "...", ["route"])
+    app.mount("/metrics", make_metrics_app())
+"""
+import os
+
+from prometheus_client import CollectorRegistry, REGISTRY, make_asgi_app, start_http_server
+from prometheus_client import multiprocess
+
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def _registry() -> CollectorRegistry:
+    if not MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def make_metrics_app():
+    """ASGI app serving the Prometheus text format."""
+    return make_asgi_app(registry=_registry())
+
+
+def start_metrics_server(port: int) -> None:
+    """Standalone exporter, for processes without an HTTP server (Celery workers)."""
+    start_http_server(port, registry=_registry())
@@ -1,14 +1,28 @@
 
-import os, secrets, string
+import os, secrets, string, uuid
 from datetime import datetime, timedelta, timezone
-from jose import jwt
+from jose import JWTError, jwt
 import bcrypt
 import pyotp
-from app.core.config import settings
+from app.core.config import settings, config
+from app.core.keys import KeyRing
 
 SECRET_KEY = settings.KEY
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 99999
+# Algoritmo dos access tokens: HS256 (chave compartilhada) ou ES256 (par de chaves
+# com `kid`, publicado em /.well-known/jwks.json para verificação local por outros
+# serviços). Refresh e reset tokens só são lidos por esta API e seguem em HS256.
+ACCESS_TOKEN_ALGORITHM = config("JWT_ALGORITHM", default=ALGORITHM)
+JWT_KEYS_DIR = config("JWT_KEYS_DIR", default="keys")
+JWT_KEY_ROTATION_DAYS = config("JWT_KEY_ROTATION_DAYS", cast=int, default=7)
+keyring = KeyRing(JWT_KEYS_DIR, ACCESS_TOKEN_ALGORITHM, JWT_KEY_ROTATION_DAYS) if ACCESS_TOKEN_ALGORITHM != ALGORITHM else None
+# Access tokens são validados sem consultar o banco durante toda a validade,
+# por isso precisam ser curtos; o token_version é checado no /refresh.
+ACCESS_TOKEN_EXPIRE_MINUTES = config("ACCESS_TOKEN_EXPIRE_MINUTES", cast=int, default=15)
+REFRESH_TOKEN_EXPIRE_DAYS = config("REFRESH_TOKEN_EXPIRE_DAYS", cast=int, default=30)
+
+ACCESS_SCOPE = "access"
+REFRESH_SCOPE = "refresh"
 
 RESET_SESSION_EXPIRE_MINUTES = 15       # short-lived session for changing password
 OTP_TTL_MINUTES = 10
@@ -28,9 +42,37 @@ def get_password_hash(password: str) -> str:
 def create_access_token(data: dict, token_version: int, expires_delta: timedelta | None = None):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire, "tv": token_version})
+    to_encode.update({"exp": expire, "tv": token_version, "scope": ACCESS_SCOPE})
+    if keyring is not None:
+        kid, private_pem = keyring.signing_key()
+        return jwt.encode(to_encode, private_pem, algorithm=ACCESS_TOKEN_ALGORITHM, headers={"kid": kid})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_refresh_token(user_id: int, token_version: int, family_id: str | None = None):
+    """
+    Returns `(token, jti, family_id, expires_at)`. `jti` identifies the row that
+    tracks this token; `family_id` groups every token rotated from the same login.
+    """
+    jti = uuid.uuid4().hex
+    family_id = family_id or uuid.uuid4().hex
+    expire = datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    payload = {"sub": str(user_id), "tv": token_version, "scope": REFRESH_SCOPE, "jti": jti, "fam": family_id, "exp": expire}
+    return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM), jti, family_id, expire
+
+def decode_token(token: str, scope: str) -> dict:
+    """Decodes and validates signature, expiry and scope. Raises `JWTError` when invalid."""
+    if scope == ACCESS_SCOPE and keyring is not None:
+        # O algoritmo é fixado pela configuração, nunca pelo header do token
+        public_pem = keyring.public_key(jwt.get_unverified_header(token).get("kid") or "")
+        if public_pem is None:
+            raise JWTError("Unknown signing key")
+        claims = jwt.decode(token, public_pem, algorithms=[ACCESS_TOKEN_ALGORITHM])
+    else:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    if claims.get("scope") != scope:
+        raise JWTError("Invalid token scope")
+    return claims
+
 def generate_otp() -> str:
     return "".join(secrets.choice(string.digits) for _ in range(OTP_LENGTH))
 
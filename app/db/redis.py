@@ -0,0 +1,40 @@
+import asyncio
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings, config
+from app.helpers.getters import isDebugMode
+
+REDIS_URL = settings.CELERY_BROKER_URL_EXTERNAL if isDebugMode() else settings.CELERY_BROKER_URL
+REDIS_MAX_CONNECTIONS = config("REDIS_MAX_CONNECTIONS", cast=int, default=50)
+
+# Pool compartilhado pelo worker; as conexões são abertas/aquecidas no lifespan (app/main.py)
+redis_pool = aioredis.ConnectionPool.from_url(REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS)
+
+
+def get_redis_client() -> aioredis.Redis:
+    return aioredis.Redis(connection_pool=redis_pool)
+
+
+async def prewarm_redis(min_connections: int) -> int:
+    """
+    Opens and PINGs `min_connections` pooled connections: concurrent commands each
+    check out their own connection, which goes back to the pool afterwards.
+    """
+    client = get_redis_client()
+    await asyncio.gather(*(client.ping() for _ in range(min_connections)))
+    return min_connections
+
+
+def redis_pool_status() -> dict:
+    """
+    Pool counters read from memory only (no command is sent to Redis). The counts
+    come from private attributes of redis-py: None if a release renames them.
+    """
+    idle = getattr(redis_pool, "_available_connections", None)
+    in_use = getattr(redis_pool, "_in_use_connections", None)
+    return {
+        "max_connections": redis_pool.max_connections,
+        "idle": len(idle) if idle is not None else None,
+        "in_use": len(in_use) if in_use is not None else None,
+    }
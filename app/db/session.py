@@ -1,11 +1,11 @@
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-from app.core.config import settings
+from app.core.config import settings, config
 from app.helpers.getters import isDebugMode
 import logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 MYSQL_INTERNAL_URL = settings.MYSQL_INTERNAL_URL
@@ -14,20 +14,76 @@ MYSQL_INTERNAL_URL_SYNC = settings.MYSQL_INTERNAL_URL_SYNC
 MYSQL_EXTERNAL_URL = settings.MYSQL_EXTERNAL_URL
 MYSQL_EXTERNAL_URL_SYNC = settings.MYSQL_EXTERNAL_URL_SYNC
 
+DB_POOL_SIZE = config("DB_POOL_SIZE", cast=int, default=10)
+DB_MAX_OVERFLOW = config("DB_MAX_OVERFLOW", cast=int, default=10)
+DB_POOL_RECYCLE = config("DB_POOL_RECYCLE", cast=int, default=1800)  # < wait_timeout do MySQL
+POOL_KWARGS = dict(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_recycle=DB_POOL_RECYCLE)
+
 if isDebugMode():
     logger.info("Using EXTERNAL database URL for debug mode")
     # mysql EXTERNAL URL LOCALHOST
-    engine_internal = create_async_engine(MYSQL_EXTERNAL_URL, future=True, echo=False)
+    engine_internal = create_async_engine(MYSQL_EXTERNAL_URL, future=True, echo=False, **POOL_KWARGS)
     SessionAsync = sessionmaker(engine_internal, class_=AsyncSession, expire_on_commit=False)
     # mysql EXTERNAL URL LOCALHOST sync
-    engine_internal_sync = create_engine(MYSQL_EXTERNAL_URL_SYNC, pool_pre_ping=True)
+    engine_internal_sync = create_engine(MYSQL_EXTERNAL_URL_SYNC, pool_pre_ping=True, **POOL_KWARGS)
     SessionSync = sessionmaker(bind=engine_internal_sync, expire_on_commit=False)
 else:
     logger.info("Using INTERNAL database URL for production mode")
     # mysql internal
-    engine_internal = create_async_engine(MYSQL_INTERNAL_URL, future=True, echo=False)
+    engine_internal = create_async_engine(MYSQL_INTERNAL_URL, future=True, echo=False, **POOL_KWARGS)
     SessionAsync = sessionmaker(engine_internal, class_=AsyncSession, expire_on_commit=False)
 
     # mysql internal sync
-    engine_internal_sync = create_engine(MYSQL_INTERNAL_URL_SYNC, pool_pre_ping=True)
-    SessionSync = sessionmaker(bind=engine_internal_sync, expire_on_commit=False)
\ No newline at end of file
+    engine_internal_sync = create_engine(MYSQL_INTERNAL_URL_SYNC, pool_pre_ping=True, **POOL_KWARGS)
+    SessionSync = sessionmaker(bind=engine_internal_sync, expire_on_commit=False)
+
+
+async def prewarm_async_pool(min_connections: int) -> int:
+    """Checks out `min_connections` connections at once, pings them and returns them to the pool."""
+    results = await asyncio.gather(*(engine_internal.connect() for _ in range(min_connections)), return_exceptions=True)
+    connections = [r for r in results if not isinstance(r, BaseException)]
+    try:
+        for error in results:
+            if isinstance(error, BaseException):
+                raise error
+        for connection in connections:
+            await connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            await connection.close()
+    return len(connections)
+
+
+def prewarm_sync_pool(min_connections: int) -> int:
+    connections = []
+    try:
+        for _ in range(min_connections):
+            connection = engine_internal_sync.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+    return len(connections)
+
+
+def _pool_status(pool) -> dict:
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+    }
+
+
+def db_pool_status() -> dict:
+    """Pool counters read from memory only (no connection is checked out)."""
+    return {
+        "async": _pool_status(engine_internal.pool),
+        "sync": _pool_status(engine_internal_sync.pool),
+    }
+
+
+async def dispose_engines():
+    await engine_internal.dispose()
+    engine_internal_sync.dispose()
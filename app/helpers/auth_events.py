@@ -0,0 +1,175 @@
+# app/helpers/auth_events.py
+"""
+Write-behind buffer for auth audit events and password reset attempt counters.
+
+Request handlers only touch Redis (one round trip each):
+- `record` appends an audit event (JSON) to the `auth:events` list;
+- `reserve_reset_attempt` atomically (Lua) takes one of the `RESET_MAX_ATTEMPTS`
+  attempts of a password reset *before* the code is checked, so parallel
+  guesses cannot all pass the lockout, and accumulates the increment in
+  `pr:attempts:dirty`.
+
+`run_writer` (started in the API lifespan, one per worker) flushes both to MySQL
+every `AUTH_EVENTS_FLUSH_SEC`: events as one multi-row INSERT per batch and
+attempts as one executemany UPDATE. Batches that fail to write are pushed back
+to Redis and retried on the next flush.
+"""
+import asyncio
+import json
+import logging
+import uuid
+from datetime import datetime, timezone
+
+from prometheus_client import Counter
+from redis.exceptions import ResponseError
+from sqlalchemy import bindparam, insert, update
+
+from app.core.config import config
+from app.core.log import request_id_var
+from app.models.auth_event import AuthEvent
+from app.models.password_reset import PasswordReset
+
+logger = logging.getLogger(__name__)
+
+AUTH_EVENTS_FLUSH_SEC = config("AUTH_EVENTS_FLUSH_SEC", cast=float, default=1.0)
+AUTH_EVENTS_BATCH = config("AUTH_EVENTS_BATCH", cast=int, default=500)
+RESET_MAX_ATTEMPTS = config("RESET_MAX_ATTEMPTS", cast=int, default=5)
+RESET_ATTEMPTS_TTL_SEC = 60 * 60  # cobre com folga a validade do OTP
+
+EVENTS_KEY = "auth:events"
+DIRTY_ATTEMPTS_KEY = "pr:attempts:dirty"
+
+auth_events_flushed = Counter("app_auth_events_flushed_total", "Auth audit events written to MySQL")
+reset_attempts_flushed = Counter("app_reset_attempts_flushed_total", "Password reset rows updated by the writer")
+auth_events_flush_errors = Counter("app_auth_events_flush_errors_total", "Failed write-behind flushes")
+
+
+# KEYS[1] = contador do reset, KEYS[2] = hash dirty; ARGV = reset_id, máximo, ttl, tentativas no MySQL.
+# O MySQL é o piso: se o Redis reiniciou ou despejou o contador, o limite não zera.
+# Retorna 0 se esgotado, senão o número desta tentativa.
+_RESERVE_LUA = """
+local n = math.max(tonumber(redis.call('GET', KEYS[1]) or '0'), tonumber(ARGV[4]))
+if n >= tonumber(ARGV[2]) then return 0 end
+n = n + 1
+redis.call('SET', KEYS[1], n, 'EX', ARGV[3])
+redis.call('HINCRBY', KEYS[2], ARGV[1], 1)
+return n
+"""
+
+
+def _attempts_key(reset_id: int) -> str:
+    return f"pr:attempts:{reset_id}"
+
+
+def _event(event: str, success: bool, user_id: int | None, email: str | None, ip: str | None) -> str:
+    return json.dumps({
+        "event": event,
+        "success": success,
+        "user_id": user_id,
+        # Truncado ao tamanho das colunas: uma linha inválida travaria o lote inteiro
+        "email": email[:100] if email else None,
+        "ip": ip[:64] if ip else None,
+        "request_id": request_id_var.get(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
+
+
+async def record(redis, event: str, success: bool, user_id: int | None = None, email: str | None = None, ip: str | None = None) -> None:
+    try:
+        await redis.rpush(EVENTS_KEY, _event(event, success, user_id, email, ip))
+    except Exception:
+        # Auditoria não pode derrubar o login
+        logger.warning("Could not buffer auth event", extra={"event": event}, exc_info=True)
+
+
+async def reserve_reset_attempt(redis, reset_id: int, persisted_attempts: int = 0) -> bool:
+    """
+    Takes one verification attempt of a password reset; False when none are left.
+    `persisted_attempts` (`password_resets.attempts`) is the floor of the counter.
+    """
+    attempt = await redis.eval(
+        _RESERVE_LUA, 2, _attempts_key(reset_id), DIRTY_ATTEMPTS_KEY,
+        str(reset_id), RESET_MAX_ATTEMPTS, RESET_ATTEMPTS_TTL_SEC, persisted_attempts or 0,
+    )
+    return int(attempt) > 0
+
+
+def _parse_event(raw: bytes | str) -> dict:
+    data = json.loads(raw)
+    # Coluna DateTime sem timezone: grava em UTC, como o resto do schema
+    data["created_at"] = datetime.fromisoformat(data["created_at"]).replace(tzinfo=None)
+    return data
+
+
+async def _flush_events(redis, session_factory) -> int:
+    raw = await redis.lpop(EVENTS_KEY, AUTH_EVENTS_BATCH)
+    if not raw:
+        return 0
+    try:
+        async with session_factory() as session:
+            await session.execute(insert(AuthEvent), [_parse_event(item) for item in raw])
+            await session.commit()
+    except Exception:
+        await redis.lpush(EVENTS_KEY, *reversed(raw))  # devolve na ordem original
+        raise
+    auth_events_flushed.inc(len(raw))
+    return len(raw)
+
+
+async def _flush_attempts(redis, session_factory) -> int:
+    # RENAME isola o lote: incrementos novos vão para um hash novo enquanto gravamos este
+    batch_key = f"{DIRTY_ATTEMPTS_KEY}:{uuid.uuid4().hex}"
+    try:
+        await redis.rename(DIRTY_ATTEMPTS_KEY, batch_key)
+    except ResponseError:
+        return 0  # nada pendente
+    pending = await redis.hgetall(batch_key)
+    rows = [{"reset_id": int(k), "n": int(v)} for k, v in pending.items()]
+    try:
+        if rows:
+            async with session_factory() as session:
+                # Core (tabela) + executemany: um único statement preparado para o lote
+                table = PasswordReset.__table__
+                await session.execute(
+                    update(table)
+                    .where(table.c.id == bindparam("reset_id"))
+                    .values(attempts=table.c.attempts + bindparam("n")),
+                    rows,
+                )
+                await session.commit()
+    except Exception:
+        async with redis.pipeline(transaction=False) as pipe:
+            for row in rows:
+                pipe.hincrby(DIRTY_ATTEMPTS_KEY, str(row["reset_id"]), row["n"])
+            await pipe.execute()
+        raise
+    finally:
+        await redis.delete(batch_key)
+    reset_attempts_flushed.inc(len(rows))
+    return len(rows)
+
+
+async def flush(redis, session_factory) -> None:
+    """Drains everything buffered so far."""
+    while await _flush_events(redis, session_factory) == AUTH_EVENTS_BATCH:
+        pass
+    await _flush_attempts(redis, session_factory)
+
+
+async def run_writer(redis, session_factory, stop: asyncio.Event) -> None:
+    """
+    Background loop of the API lifespan. Setting `stop` ends it after a final
+    flush (instead of cancelling it halfway through a batch).
+    """
+    while True:
+        try:
+            await flush(redis, session_factory)
+        except Exception:
+            auth_events_flush_errors.inc()
+            logger.exception("Auth write-behind flush failed")
+        if stop.is_set():
+            return
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=AUTH_EVENTS_FLUSH_SEC)
+        except asyncio.TimeoutError:
+            pass
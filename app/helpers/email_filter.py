@@ -0,0 +1,229 @@
+# app/helpers/email_filter.py
+"""
+Bloom filter of registered emails, stored in Redis and shared by every worker.
+
+`might_exist` answers "definitely not registered" without touching MySQL, so
+enumeration / credential-stuffing traffic with random addresses stops at Redis.
+A positive answer only means "maybe": the caller still queries the database.
+The filter never produces false negatives while it is maintained:
+
+- `add` runs on register before the commit (a failed commit only leaves a
+  harmless false positive) and again after it, so a user committed after a
+  concurrent rebuild's catch-up still lands in the current bitmap;
+- `rebuild` recreates it from the `users` table (Celery beat + on startup when
+  missing), sized for `EMAIL_FILTER_CAPACITY` items at `EMAIL_FILTER_FP_RATE`,
+  growing the capacity when the table outgrew it, then swaps it in atomically
+  and re-adds users created while it was being built.
+
+While the filter does not exist yet, or Redis fails, every email is a "maybe".
+Emails are normalized (strip + lower) because MySQL compares them case-insensitively,
+and hashed with a key derived from `settings.KEY` so false positives cannot be
+precomputed offline.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta, timezone
+
+from prometheus_client import Counter, Gauge
+from sqlalchemy import func, select
+
+from app.core.config import config, settings
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+EMAIL_FILTER_ENABLED = config("EMAIL_FILTER_ENABLED", cast=bool, default=True)
+EMAIL_FILTER_CAPACITY = config("EMAIL_FILTER_CAPACITY", cast=int, default=1_000_000)
+EMAIL_FILTER_FP_RATE = config("EMAIL_FILTER_FP_RATE", cast=float, default=0.01)
+
+META_KEY = "emailfilter:meta"
+LOCK_KEY = "emailfilter:rebuild"
+REBUILD_LOCK_SEC = 15 * 60
+CATCH_UP_MARGIN = timedelta(minutes=5)
+
+_HASH_KEY = hashlib.sha256(f"emailfilter:{settings.KEY}".encode("utf-8")).digest()
+
+# KEYS[1] = meta; ARGV = h1, h2. Retorna -1 sem filtro, 0 ausente, 1 talvez.
+_CHECK_LUA = """
+local meta = redis.call('HMGET', KEYS[1], 'key', 'm', 'k')
+if not meta[1] then return -1 end
+local m, k = tonumber(meta[2]), tonumber(meta[3])
+local h1, h2 = tonumber(ARGV[1]), tonumber(ARGV[2])
+for i = 0, k - 1 do
+    if redis.call('GETBIT', meta[1], (h1 + i * h2) % m) == 0 then return 0 end
+end
+return 1
+"""
+
+# KEYS[1] = meta; ARGV = h1, h2. Sem filtro não faz nada (o rebuild cobrirá o email).
+# Só conta o item se algum bit era 0: re-adds (register após o commit, catch-up do rebuild)
+# não inflam `n` nem a taxa de falso positivo reportada.
+_ADD_LUA = """
+local meta = redis.call('HMGET', KEYS[1], 'key', 'm', 'k')
+if not meta[1] then return 0 end
+local m, k = tonumber(meta[2]), tonumber(meta[3])
+local h1, h2 = tonumber(ARGV[1]), tonumber(ARGV[2])
+local added = 0
+for i = 0, k - 1 do
+    if redis.call('SETBIT', meta[1], (h1 + i * h2) % m, 1) == 0 then added = 1 end
+end
+if added == 1 then redis.call('HINCRBY', KEYS[1], 'n', 1) end
+return 1
+"""
+
+email_filter_checks = Counter(
+    "app_email_filter_checks_total", "Email filter lookups by outcome", ["outcome"]
+)
+email_filter_false_positives = Counter(
+    "app_email_filter_false_positives_total", "Filter said 'maybe' but the email was not in the database"
+)
+email_filter_bits = Gauge("app_email_filter_bits", "Filter size in bits", multiprocess_mode="max")
+email_filter_hashes = Gauge("app_email_filter_hashes", "Hash functions per item", multiprocess_mode="max")
+email_filter_items = Gauge("app_email_filter_items", "Items added to the filter", multiprocess_mode="max")
+email_filter_expected_fp_rate = Gauge(
+    "app_email_filter_expected_fp_rate", "False-positive rate implied by size, hashes and items", multiprocess_mode="max"
+)
+
+
+def sizing(capacity: int, fp_rate: float) -> tuple[int, int]:
+    """Optimal `(bits, hashes)` for `capacity` items at `fp_rate`."""
+    bits = max(8, math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+    hashes = max(1, round(bits / max(1, capacity) * math.log(2)))
+    return bits, hashes
+
+
+def expected_fp_rate(bits: int, hashes: int, items: int) -> float:
+    return (1 - math.exp(-hashes * items / bits)) ** hashes
+
+
+def _hashes(email: str) -> tuple[int, int]:
+    digest = hashlib.blake2b(email.strip().lower().encode("utf-8"), key=_HASH_KEY, digest_size=8).digest()
+    # 32 bits cada: h1 + i*h2 continua exato nos números (double) do Lua
+    return int.from_bytes(digest[:4], "big"), int.from_bytes(digest[4:], "big") | 1
+
+
+def _offsets(email: str, bits: int, hashes: int):
+    h1, h2 = _hashes(email)
+    return ((h1 + i * h2) % bits for i in range(hashes))
+
+
+async def might_exist(redis, email: str) -> bool:
+    """False only when the email is definitely not registered."""
+    if not EMAIL_FILTER_ENABLED:
+        return True
+    try:
+        found = await redis.eval(_CHECK_LUA, 1, META_KEY, *_hashes(email))
+    except Exception:
+        logger.warning("Email filter unavailable, falling back to the database", exc_info=True)
+        email_filter_checks.labels("error").inc()
+        return True
+    if found == -1:
+        email_filter_checks.labels("not_built").inc()
+        return True
+    email_filter_checks.labels("maybe" if found else "definite_miss").inc()
+    return bool(found)
+
+
+def record_false_positive() -> None:
+    email_filter_false_positives.inc()
+
+
+async def add(redis, email: str) -> None:
+    if not EMAIL_FILTER_ENABLED:
+        return
+    try:
+        await redis.eval(_ADD_LUA, 1, META_KEY, *_hashes(email))
+    except Exception:
+        # Um filtro sem este email daria falso negativo: descarta-o até o próximo rebuild
+        logger.error("Email filter add failed, dropping the filter", exc_info=True)
+        try:
+            await redis.delete(META_KEY)
+        except Exception:
+            pass
+
+
+def _add_sync(redis, email: str) -> None:
+    redis.eval(_ADD_LUA, 1, META_KEY, *_hashes(email))
+
+
+def report(meta: dict) -> dict:
+    """Updates the gauges from the filter metadata and returns them."""
+    bits, hashes, items = int(meta["m"]), int(meta["k"]), int(meta.get("n", 0))
+    stats = {
+        "bits": bits,
+        "bytes": (bits + 7) // 8,
+        "hashes": hashes,
+        "items": items,
+        "expected_fp_rate": expected_fp_rate(bits, hashes, items),
+    }
+    email_filter_bits.set(bits)
+    email_filter_hashes.set(hashes)
+    email_filter_items.set(items)
+    email_filter_expected_fp_rate.set(stats["expected_fp_rate"])
+    return stats
+
+
+def _decode(meta: dict) -> dict:
+    return {(k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v) for k, v in meta.items()}
+
+
+async def status(redis) -> dict | None:
+    meta = _decode(await redis.hgetall(META_KEY))
+    return report(meta) if meta else None
+
+
+async def ensure_built(redis, redis_sync, session_factory) -> None:
+    """Startup hook: builds the filter if missing (in a thread) and reports its stats."""
+    try:
+        await asyncio.to_thread(rebuild, redis_sync, session_factory, only_if_missing=True)
+        stats = await status(redis)
+        if stats:
+            logger.info("Email filter ready", extra=stats)
+    except Exception:
+        logger.exception("Email filter build failed; lookups fall back to the database")
+
+
+def rebuild(redis, session_factory, only_if_missing: bool = False) -> dict | None:
+    """
+    Rebuilds the filter from the `users` table (sync: Celery task / thread).
+    Only one process rebuilds at a time; returns the new stats, or None if skipped.
+    """
+    if not EMAIL_FILTER_ENABLED:
+        return None
+    if only_if_missing and redis.exists(META_KEY):
+        return None
+    if not redis.set(LOCK_KEY, "1", nx=True, ex=REBUILD_LOCK_SEC):
+        return None
+    try:
+        started_at = datetime.now(timezone.utc)
+        with session_factory() as session:
+            count = session.scalar(select(func.count(User.id))) or 0
+            bits, hashes = sizing(max(EMAIL_FILTER_CAPACITY, 2 * count), EMAIL_FILTER_FP_RATE)
+            bitmap = bytearray((bits + 7) // 8)
+            items = 0
+            for email in session.scalars(select(User.email).execution_options(yield_per=10_000)):
+                for offset in _offsets(email, bits, hashes):
+                    bitmap[offset >> 3] |= 0x80 >> (offset & 7)  # bit 0 do Redis = MSB do 1º byte
+                items += 1
+
+        new_key = f"emailfilter:bits:{int(time.time() * 1000)}"
+        old_key = redis.hget(META_KEY, "key")
+        redis.set(new_key, bytes(bitmap))
+        meta = {"key": new_key, "m": bits, "k": hashes, "n": items, "built_at": started_at.isoformat()}
+        redis.hset(META_KEY, mapping=meta)
+
+        # Usuários registrados durante o build podem ter ido só para o bitmap antigo
+        with session_factory() as session:
+            for email in session.scalars(select(User.email).where(User.created_at >= started_at - CATCH_UP_MARGIN)):
+                _add_sync(redis, email)
+        if old_key:
+            redis.delete(old_key)
+
+        stats = report(_decode(redis.hgetall(META_KEY)))
+        logger.info("Email filter rebuilt", extra=stats)
+        return stats
+    finally:
+        redis.delete(LOCK_KEY)
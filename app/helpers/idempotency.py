@@ -0,0 +1,130 @@
+# app/helpers/idempotency.py
+"""
+`Idempotency-Key` support backed by Redis.
+
+The first request with a given key claims it (SET NX) and runs; its response is
+stored for `IDEMPOTENCY_TTL_SEC` and replayed to every retry with the same key.
+Duplicates that arrive while the first one is still running wait for its result
+instead of redoing the work, for at most `IDEMPOTENCY_WAIT_SEC`: the wait holds a
+slot of the route's concurrency limiter (app/api/middleware.py), so it is kept
+around the limiter's queue timeout and then answers 409 for the client to retry.
+Reusing a key with a different payload is a 422.
+Responses that carry credentials are not stored: `fn` returns them wrapped in
+`Replayable`, only its marker is kept and retries get `await replay(marker)`
+(e.g. freshly issued tokens).
+
+usage:\n
+    return await run_idempotent(redis, "register", idempotency_key, payload, lambda: _register(...))
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import time
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.core.config import config, settings
+
+IDEMPOTENCY_TTL_SEC = config("IDEMPOTENCY_TTL_SEC", cast=int, default=24 * 60 * 60)
+IDEMPOTENCY_LOCK_SEC = config("IDEMPOTENCY_LOCK_SEC", cast=int, default=30)  # validade da reserva do primeiro request
+IDEMPOTENCY_WAIT_SEC = config("IDEMPOTENCY_WAIT_SEC", cast=float, default=2.0)  # espera de duplicatas (segura vaga do limiter)
+IDEMPOTENCY_POLL_SEC = 0.05
+REPLAY_HEADER = "Idempotent-Replayed"
+
+
+def _fingerprint(payload: BaseModel | None) -> str:
+    # HMAC: o payload pode conter senha, que não deve ficar exposta a brute force no Redis
+    raw = json.dumps(jsonable_encoder(payload), sort_keys=True) if payload is not None else ""
+    return hmac.new(settings.KEY.encode("utf-8"), raw.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+class Replayable:
+    """
+    Result of `fn` whose response must not be stored (it carries credentials):
+    only `marker` is kept, and retries get `await replay(marker)`.
+    """
+    def __init__(self, response: Any, marker: dict):
+        self.response = response
+        self.marker = marker
+
+
+def _unwrap(result: Any) -> Any:
+    return result.response if isinstance(result, Replayable) else result
+
+
+async def _replay(entry: dict, replay: Callable[[dict], Awaitable[Any]] | None) -> JSONResponse:
+    body = jsonable_encoder(await replay(entry["marker"])) if "marker" in entry else entry["body"]
+    return JSONResponse(body, status_code=entry["status"], headers={REPLAY_HEADER: "true"})
+
+
+async def _wait_for_result(redis, key: str, fingerprint: str, replay: Callable[[dict], Awaitable[Any]] | None) -> JSONResponse:
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SEC
+    delay = IDEMPOTENCY_POLL_SEC
+    while True:
+        raw = await redis.get(key)
+        if raw is None:
+            # O primeiro request falhou sem resposta reproduzível; o cliente pode tentar de novo
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Requisição original falhou, tente novamente")
+        entry = json.loads(raw)
+        if entry["fp"] != fingerprint:
+            raise HTTPException(status_code=422, detail="Idempotency-Key reutilizada com outro conteúdo")
+        if entry["state"] == "done":
+            return await _replay(entry, replay)
+        if time.monotonic() >= deadline:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Requisição com esta Idempotency-Key ainda em processamento")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+
+async def run_idempotent(
+    redis,
+    scope: str,
+    idempotency_key: str | None,
+    payload: BaseModel | None,
+    fn: Callable[[], Awaitable[Any]],
+    status_code: int = 200,
+    replay: Callable[[dict], Awaitable[Any]] | None = None,
+) -> Any:
+    """
+    Runs `fn` at most once per `(scope, idempotency_key)`. Without a key, just runs it.
+    `scope` should include the authenticated user, when there is one.
+    Successful and 4xx responses are stored; 429, 5xx and unexpected errors release the key.
+    A `Replayable` result is not stored: retries return `await replay(marker)`.
+    """
+    if not idempotency_key:
+        return _unwrap(await fn())
+    if len(idempotency_key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key muito longa")
+
+    key = f"idem:{scope}:{idempotency_key}"
+    fingerprint = _fingerprint(payload)
+    pending = json.dumps({"state": "pending", "fp": fingerprint})
+    if not await redis.set(key, pending, nx=True, ex=IDEMPOTENCY_LOCK_SEC):
+        return await _wait_for_result(redis, key, fingerprint, replay)
+
+    try:
+        result = await fn()
+    except HTTPException as exc:
+        # 429 e 5xx são transitórios: libera a chave para que o retry rode de novo
+        if exc.status_code >= 500 or exc.status_code == status.HTTP_429_TOO_MANY_REQUESTS:
+            await redis.delete(key)
+            raise
+        entry = {"state": "done", "fp": fingerprint, "status": exc.status_code, "body": {"detail": exc.detail}}
+        await redis.set(key, json.dumps(entry), ex=IDEMPOTENCY_TTL_SEC)
+        raise
+    except BaseException:
+        await redis.delete(key)
+        raise
+
+    body = jsonable_encoder(_unwrap(result))
+    if isinstance(result, Replayable):
+        entry = {"state": "done", "fp": fingerprint, "status": status_code, "marker": result.marker}
+    else:
+        entry = {"state": "done", "fp": fingerprint, "status": status_code, "body": body}
+    await redis.set(key, json.dumps(entry), ex=IDEMPOTENCY_TTL_SEC)
+    return JSONResponse(body, status_code=status_code)
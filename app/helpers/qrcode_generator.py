@@ -2,8 +2,11 @@
 import qrcode
 import io
 import base64
+import logging
 from typing import Optional
 
+logger = logging.getLogger(__name__)
+
 def generate_qr_code_base64(data: str, box_size: int = 10, border: int = 4) -> str:
     """
     Gera um QR Code a partir de uma string e retorna como Base64.
@@ -43,8 +46,7 @@ def generate_qr_code_base64(data: str, box_size: int = 10, border: int = 4) -> s
         return img_base64
 
     except Exception as e:
-        # Log do erro em produção
-        print(f"Erro ao gerar QR Code: {str(e)}")
+        logger.exception("Erro ao gerar QR Code")
         raise ValueError("Falha ao gerar QR Code") from e
 
 def generate_qr_code_data_url(data: str, box_size: int = 10, border: int = 4) -> str:
@@ -76,5 +78,5 @@ def generate_qr_for_terminal_api(data: str) -> Optional[str]:
         qr.make(fit=True)
         return qr.print_ascii(invert=True)
     except Exception as e:
-        print(f"Erro ao gerar QR Code para terminal: {str(e)}")
+        logger.warning("Erro ao gerar QR Code para terminal: %s", e)
         return None
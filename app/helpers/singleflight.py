@@ -0,0 +1,43 @@
+# app/helpers/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+from prometheus_client import Counter
+
+singleflight_calls = Counter(
+    "app_singleflight_calls_total", "Lookups requested through a single-flight group", ["group"]
+)
+singleflight_coalesced = Counter(
+    "app_singleflight_coalesced_total", "Lookups that joined an identical call already in flight", ["group"]
+)
+
+
+class SingleFlight:
+    """
+    Per-worker coalescing of concurrent identical lookups: while a call for `key`
+    is in flight, later callers await the same result instead of running it again.
+    Nothing is cached once the call finishes.
+
+    The lookup runs in its own task, so a cancelled caller (client disconnect)
+    does not cancel it for the others. It must therefore not depend on a
+    request-scoped resource such as the caller's DB session, and its result is
+    shared between callers, so return plain data rather than ORM instances.
+
+    usage:\n
+        users = SingleFlight("user")
+        profile = await users.do(user_id, lambda: load_profile(user_id))
+    """
+    def __init__(self, group: str):
+        self.group = group
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        singleflight_calls.labels(self.group).inc()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, key=key: self._inflight.pop(key, None))
+        else:
+            singleflight_coalesced.labels(self.group).inc()
+        return await asyncio.shield(task)
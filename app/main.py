@@ -1,10 +1,98 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.api.endpoints import auth, teams
-from app.db.session import engine_internal_sync
+from app.api.endpoints import auth, teams, well_known, health
+from app.api.middleware import RequestIdMiddleware, ConcurrencyLimitMiddleware, parse_concurrency_limits
+from app.core.config import config
+from app.core.metrics import make_metrics_app
+from app.db.session import engine_internal_sync, SessionAsync, SessionSync, prewarm_async_pool, prewarm_sync_pool, dispose_engines
+from app.db.redis import redis_pool, prewarm_redis, get_redis_client
 from app.db.base import Base
+from app.helpers import auth_events, email_filter, rate_limit
 
-app = FastAPI(title="API Applicativo")
+logger = logging.getLogger(__name__)
+
+DB_POOL_MIN_WARM = config("DB_POOL_MIN_WARM", cast=int, default=2)
+REDIS_POOL_MIN_WARM = config("REDIS_POOL_MIN_WARM", cast=int, default=2)
+WARMUP_RETRY_MAX_SEC = config("WARMUP_RETRY_MAX_SEC", cast=float, default=30.0)
+
+# Limites por worker no formato "prefixo=concorrência:fila:timeout_fila_seg" (vence o prefixo mais longo).
+# O start tem limiter próprio: cada request dorme até FORGOT_PASSWORD_MIN_RESPONSE_MS segurando a vaga,
+# então precisa de mais vagas (sleep não custa CPU/banco) e não pode esgotar as de verify/confirm.
+CONCURRENCY_LIMITS = parse_concurrency_limits(config(
+    "CONCURRENCY_LIMITS",
+    default=(
+        "/api/auth/login=4:16:2,/api/auth/register=2:8:2,/api/auth/forgot-password=4:16:2,"
+        "/api/auth/forgot-password/start=32:64:2"
+    ),
+))
+CONCURRENCY_DEFAULT = parse_concurrency_limits(
+    "default=" + config("CONCURRENCY_DEFAULT", default="64:256:5")
+)["default"]
+
+async def _warm_up(app: FastAPI) -> None:
+    warm_async, warm_sync, warm_redis, _ = await asyncio.gather(
+        prewarm_async_pool(DB_POOL_MIN_WARM),
+        asyncio.to_thread(prewarm_sync_pool, DB_POOL_MIN_WARM),
+        prewarm_redis(REDIS_POOL_MIN_WARM),
+        asyncio.to_thread(rate_limit.r.ping),
+    )
+    app.state.warmup = {"db_async": warm_async, "db_sync": warm_sync, "redis": warm_redis}
+    app.state.ready = True
+    logger.info("Connection pools pre-warmed", extra=app.state.warmup)
+
+async def _retry_warm_up(app: FastAPI) -> None:
+    # MySQL/Redis podem ainda estar subindo (compose): tenta de novo com backoff até conseguir
+    delay = 1.0
+    while True:
+        await asyncio.sleep(delay)
+        try:
+            await _warm_up(app)
+            return
+        except Exception:
+            logger.warning("Connection pool pre-warm failed, retrying", extra={"retry_in_sec": delay}, exc_info=True)
+            delay = min(delay * 2, WARMUP_RETRY_MAX_SEC)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Abre e testa (ping) as conexões mínimas dos pools antes de aceitar tráfego,
+    para que o primeiro request de cada worker não pague connect/TLS/auth, e as
+    fecha no shutdown. `/readyz` só responde 200 depois do warmup.
+    """
+    app.state.ready = False
+    app.state.warmup = None
+    warm_up_retry = None
+    try:
+        await _warm_up(app)
+    except Exception:
+        # Sobe mesmo assim (conexões serão abertas sob demanda), fora do balanceador até o retry conseguir
+        logger.exception("Connection pool pre-warm failed")
+        warm_up_retry = asyncio.create_task(_retry_warm_up(app))
+    # Cria o filtro de emails se ainda não existir (em background; até lá tudo é "talvez")
+    app.state.email_filter_build = asyncio.create_task(
+        email_filter.ensure_built(get_redis_client(), rate_limit.r, SessionSync)
+    )
+    # Grava em lote no MySQL os eventos de auditoria/tentativas acumulados no Redis
+    writer_stop = asyncio.Event()
+    writer = asyncio.create_task(auth_events.run_writer(get_redis_client(), SessionAsync, writer_stop))
+    yield
+    if warm_up_retry is not None:
+        warm_up_retry.cancel()
+        await asyncio.gather(warm_up_retry, return_exceptions=True)
+    app.state.ready = False
+    writer_stop.set()
+    await writer
+    # O build roda numa thread com SessionSync e rate_limit.r: espera terminar antes de fechá-los
+    # (cancelar a task não para a thread)
+    await app.state.email_filter_build
+    await dispose_engines()
+    await redis_pool.disconnect()
+    rate_limit.r.close()
+
+app = FastAPI(title="API Applicativo", lifespan=lifespan)
 
 Base.metadata.create_all(bind=engine_internal_sync)
 
@@ -12,17 +100,29 @@ origins = [
     "*"
 ]
 
+# Mais interno que o CORS, para que as respostas 503 ainda levem os cabeçalhos CORS
+app.add_middleware(
+    ConcurrencyLimitMiddleware,
+    limits=CONCURRENCY_LIMITS,
+    default=CONCURRENCY_DEFAULT,
+    exempt=("/healthz", "/readyz", "/metrics"),
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,         # Permite apenas as origens definidas na lista
     allow_credentials=True,        # Permite o envio de cookies e credenciais
     allow_methods=["*"],           # Permite todos os métodos (GET, POST, etc.)
     allow_headers=["*"],           # Permite todos os cabeçalhos
+    expose_headers=["X-Request-ID", "Idempotent-Replayed"],
 )
+app.add_middleware(RequestIdMiddleware)  # Correlaciona logs pelo X-Request-ID
 
 
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(teams.router, prefix="/api/teams", tags=["teams"])
+app.include_router(well_known.router, tags=["well-known"])
+app.include_router(health.router, tags=["health"])
+app.mount("/metrics", make_metrics_app())
 
 @app.get("/")
 def root():
@@ -0,0 +1,22 @@
+# app/models/auth_event.py
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
+from datetime import datetime, timezone
+from app.db.base import Base
+
+class AuthEvent(Base):
+    """Audit trail of authentication events, written in batches (see app/helpers/auth_events.py)."""
+    __tablename__ = "auth_events"
+
+    id = Column(Integer, primary_key=True)
+    event = Column(String(32), nullable=False)           # login, reset_otp, reset_totp, reset_verified, password_reset
+    success = Column(Boolean, nullable=False)
+    user_id = Column(Integer, nullable=True)             # sem FK: o evento sobrevive ao usuário
+    email = Column(String(100), nullable=True)
+    ip = Column(String(64), nullable=True)
+    request_id = Column(String(64), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        Index("ix_auth_events_user_created", "user_id", "created_at"),
+        Index("ix_auth_events_email_created", "email", "created_at"),
+    )
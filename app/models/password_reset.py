@@ -1,5 +1,5 @@
 # app/models/password_reset.py
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone, timedelta
 from app.db.base import Base
@@ -25,3 +25,9 @@ class PasswordReset(Base):
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
     user = relationship("User")
+
+    __table_args__ = (
+        # Último reset em aberto por email (verify) e por usuário (confirm)
+        Index("ix_password_resets_email_open", "email", "consumed_at", "id"),
+        Index("ix_password_resets_user_open", "user_id", "consumed_at", "id"),
+    )
@@ -0,0 +1,25 @@
+# app/models/refresh_token.py
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from datetime import datetime, timezone
+from app.db.base import Base
+
+class RefreshToken(Base):
+    """
+    One row per issued refresh token. Tokens rotate on every use: the used row
+    gets `used_at` and a new row is issued in the same `family_id`. Presenting
+    an already used token is treated as theft and revokes the whole family.
+    Expired and revoked rows are purged by the `purge_refresh_tokens` beat task.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String(64), unique=True, index=True, nullable=False)
+    family_id = Column(String(64), index=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    expires_at = Column(DateTime, index=True, nullable=False)  # purge
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, index=True, nullable=True)   # purge
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+    user = relationship("User")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime, timezone
 from app.db.base import Base
@@ -13,3 +13,9 @@ class Team(Base):
     updated_at = Column(DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     
     owner = relationship("User", foreign_keys=[user_id], back_populates="teams")
+
+    __table_args__ = (
+        # Busca por prefixo do nome dentro dos times do usuário (/api/teams/search),
+        # ordenada por (name, id) para a paginação por keyset
+        Index("ix_teams_user_id_name", "user_id", "name"),
+    )
@@ -13,7 +13,9 @@ Este módulo configura e inicializa uma instância do Celery para gerenciamento
 
 Utilize `celery_app` para registrar e executar tarefas assíncronas na aplicação.
 """
-from app.core.config import CELERY_BROKER_URL_CASE, CELERY_BROKER_URL_CASE, CELERY_RESULT_BACKEND_CASE
+from celery.signals import setup_logging, before_task_publish, task_prerun, task_postrun
+from app.core.config import CELERY_BROKER_URL_CASE, CELERY_BROKER_URL_CASE, CELERY_RESULT_BACKEND_CASE, config
+from app.core.log import request_id_var
 
 celery_app = Celery(
     broker_url = CELERY_BROKER_URL_CASE,
@@ -27,3 +29,47 @@ celery_app = Celery(
         'visibility_timeout': 365*24*60*60,
     }
 )
+
+celery_app.conf.beat_schedule = {
+    # Remove bits de emails apagados e redimensiona o filtro conforme a tabela cresce
+    "rebuild-email-filter": {
+        "task": "rebuild_email_filter",
+        "schedule": config("EMAIL_FILTER_REBUILD_HOURS", cast=float, default=24.0) * 60 * 60,
+    },
+    # Cada login/refresh grava uma linha em refresh_tokens; remove as vencidas e revogadas
+    "purge-refresh-tokens": {
+        "task": "purge_refresh_tokens",
+        "schedule": config("REFRESH_TOKEN_PURGE_HOURS", cast=float, default=6.0) * 60 * 60,
+    },
+}
+
+
+@setup_logging.connect
+def _keep_app_logging(**kwargs):
+    """Impede o Celery de sobrescrever o pipeline de logging configurado em `app.core.config`."""
+
+
+@before_task_publish.connect
+def _propagate_request_id(headers=None, **kwargs):
+    request_id = request_id_var.get()
+    if headers is not None and request_id:
+        headers.setdefault("request_id", request_id)
+
+
+@task_prerun.connect
+def _bind_request_id(task_id=None, task=None, **kwargs):
+    if task is None:
+        return
+    request_id = getattr(task.request, "request_id", None) or task_id
+    task.request.log_token = request_id_var.set(request_id)
+
+
+@task_postrun.connect
+def _unbind_request_id(task=None, **kwargs):
+    token = getattr(task.request, "log_token", None) if task is not None else None
+    if token is not None:
+        request_id_var.reset(token)
+
+
+# Métricas de fila/execução das tasks (sinais registrados na importação)
+from app.mycelery import instrumentation  # noqa: E402,F401
@@ -0,0 +1,122 @@
+# app/mycelery/instrumentation.py
+"""
+Signal-based instrumentation for the Celery tasks.
+
+- before_task_publish: stamps the message with `enqueued_at` (producer clock).
+- task_prerun: records enqueue-to-start lag (from the ETA, for delayed tasks) and
+  warns when an OTP email waited longer than `OTP_DELIVERY_LAG_SLO_SEC`.
+- task_postrun / task_retry / task_failure: run time and outcome per task and queue.
+
+Metrics are exported by `start_metrics_server` on `CELERY_METRICS_PORT` from the
+main worker process. With the prefork pool the tasks run in child processes, so
+`PROMETHEUS_MULTIPROC_DIR` must be set for the exporter to see their samples
+(docker-entrypoint.sh sets a dedicated, cleared one for the worker).
+Lag assumes API and worker clocks are in sync (NTP).
+"""
+import logging
+import os
+import time
+from datetime import datetime
+
+from celery.signals import (
+    before_task_publish, task_prerun, task_postrun, task_retry, task_failure, worker_init, worker_process_shutdown,
+)
+from prometheus_client import Counter, Histogram, multiprocess
+
+from app.core.config import config
+from app.core.metrics import MULTIPROC_DIR, start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+CELERY_METRICS_PORT = config("CELERY_METRICS_PORT", cast=int, default=9808)  # 0 desativa
+OTP_DELIVERY_LAG_SLO_SEC = config("OTP_DELIVERY_LAG_SLO_SEC", cast=float, default=30.0)
+OTP_TASKS = {"send_password_otp", "send_password_otp_local"}
+
+_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+task_queue_lag = Histogram(
+    "celery_task_queue_lag_seconds", "Time between enqueue (or ETA) and task start", ["task", "queue"], buckets=_BUCKETS
+)
+task_runtime = Histogram(
+    "celery_task_runtime_seconds", "Task execution time", ["task", "queue", "state"], buckets=_BUCKETS
+)
+task_retries = Counter("celery_task_retries_total", "Task retries", ["task", "queue"])
+task_failures = Counter("celery_task_failures_total", "Tasks that raised", ["task", "queue", "exception"])
+otp_lag_slo_breaches = Counter(
+    "celery_otp_lag_slo_breaches_total", "OTP deliveries that started after the lag SLO", ["task"]
+)
+
+_started: dict[str, float] = {}  # task_id -> monotonic start
+
+
+def _queue(task) -> str:
+    delivery_info = getattr(task.request, "delivery_info", None) or {}
+    return delivery_info.get("routing_key") or "unknown"
+
+
+def _ready_at(request) -> float | None:
+    enqueued_at = getattr(request, "enqueued_at", None)
+    if enqueued_at is None:
+        return None
+    ready_at = float(enqueued_at)
+    if request.eta:
+        eta = request.eta if isinstance(request.eta, datetime) else datetime.fromisoformat(request.eta)
+        ready_at = max(ready_at, eta.timestamp())
+    return ready_at
+
+
+@worker_init.connect
+def _start_exporter(**kwargs):
+    if CELERY_METRICS_PORT:
+        start_metrics_server(CELERY_METRICS_PORT)
+        logger.info("Celery metrics exporter listening", extra={"port": CELERY_METRICS_PORT})
+
+
+@worker_process_shutdown.connect
+def _mark_child_dead(**kwargs):
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@before_task_publish.connect
+def _stamp_enqueued_at(headers=None, **kwargs):
+    if headers is not None:
+        headers["enqueued_at"] = time.time()
+
+
+@task_prerun.connect
+def _record_lag(task_id=None, task=None, **kwargs):
+    if task is None:
+        return
+    _started[task_id] = time.monotonic()
+    ready_at = _ready_at(task.request)
+    if ready_at is None:
+        return
+    lag = max(0.0, time.time() - ready_at)
+    task_queue_lag.labels(task.name, _queue(task)).observe(lag)
+    if task.name in OTP_TASKS and lag > OTP_DELIVERY_LAG_SLO_SEC:
+        otp_lag_slo_breaches.labels(task.name).inc()
+        logger.warning(
+            "OTP delivery lag above SLO",
+            extra={"task": task.name, "lag_sec": round(lag, 3), "slo_sec": OTP_DELIVERY_LAG_SLO_SEC},
+        )
+
+
+@task_postrun.connect
+def _record_runtime(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    if task is None or started is None:
+        return
+    task_runtime.labels(task.name, _queue(task), state or "UNKNOWN").observe(time.monotonic() - started)
+
+
+@task_retry.connect
+def _record_retry(sender=None, **kwargs):
+    if sender is not None:
+        task_retries.labels(sender.name, _queue(sender)).inc()
+
+
+@task_failure.connect
+def _record_failure(sender=None, exception=None, **kwargs):
+    if sender is not None:
+        task_failures.labels(sender.name, _queue(sender), type(exception).__name__).inc()
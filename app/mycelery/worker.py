@@ -1,16 +1,29 @@
+import logging
 import os
 import smtplib
 import time
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+import redis
+from app.core.config import CELERY_BROKER_URL_CASE
+from app.helpers import email_filter
 from app.mycelery.app import celery_app
 
+logger = logging.getLogger(__name__)
+
 @celery_app.task(name="create_task")
 def create_task(task_type):
     time.sleep(int(task_type) * 10)
     return True
 
-@celery_app.task(name="send_password_otp")
+# Falhas de SMTP/rede são transitórias: retry com backoff, bem dentro dos 10 min de validade do OTP
+@celery_app.task(
+    name="send_password_otp",
+    autoretry_for=(smtplib.SMTPException, OSError),
+    retry_backoff=5,
+    retry_backoff_max=60,
+    max_retries=3,
+)
 def send_password_otp(email: str, otp: str):
     """Envia OTP por email usando Gmail SMTP"""
     try:
@@ -59,16 +72,54 @@ def send_password_otp(email: str, otp: str):
         return {"sent": True, "email": email}
 
     except Exception as e:
-        # Log do erro (em produção, use logging adequado)
-        print(f"Erro ao enviar email para {email}: {str(e)}")
-        return {"sent": False, "error": str(e)}
+        logger.error("Erro ao enviar email de OTP", extra={"email": email, "error": str(e)})
+        # Propaga para que o Celery registre retry/falha (task_retry / task_failure)
+        raise
 
 @celery_app.task(name="send_password_otp_local")
 def send_password_otp_local(email: str, otp: str):
     """Simula envio de OTP localmente (para desenvolvimento)"""
-    print(f"=== EMAIL SIMULADO ===")
-    print(f"Para: {email}")
-    print(f"Assunto: Código de Verificação - Sistema de Sindicância Applicativo")
-    print(f"Código: {otp}")
-    print(f"====================")
+    logger.info(
+        "EMAIL SIMULADO",
+        extra={
+            "to": email,
+            "subject": "Código de Verificação - Sistema de Sindicância Applicativo",
+            "otp": otp,
+        },
+    )
     return {"sent": True}
+
+@celery_app.task(name="rebuild_email_filter")
+def rebuild_email_filter():
+    """Reconstrói o filtro de emails a partir da tabela users (agendado no beat)"""
+    from app.db.session import SessionSync
+
+    client = redis.from_url(CELERY_BROKER_URL_CASE)
+    try:
+        return email_filter.rebuild(client, SessionSync)
+    finally:
+        client.close()
+
+@celery_app.task(name="purge_refresh_tokens")
+def purge_refresh_tokens(batch_size: int = 5000):
+    """Remove refresh tokens vencidos e os revogados há mais de um dia (agendado no beat)"""
+    from datetime import datetime, timedelta, timezone
+    from sqlalchemy import delete, or_, select
+    from app.db.session import SessionSync
+    from app.models.refresh_token import RefreshToken
+
+    now = datetime.now(timezone.utc)
+    # Tokens usados mas ainda válidos ficam: são eles que detectam o reuso de um token rotacionado
+    expired = or_(RefreshToken.expires_at < now, RefreshToken.revoked_at < now - timedelta(days=1))
+    deleted = 0
+    with SessionSync() as session:
+        # Em lotes, para não segurar locks da tabela inteira
+        while True:
+            ids = session.scalars(select(RefreshToken.id).where(expired).limit(batch_size)).all()
+            if not ids:
+                break
+            session.execute(delete(RefreshToken).where(RefreshToken.id.in_(ids)))
+            session.commit()
+            deleted += len(ids)
+    logger.info("Refresh tokens purged", extra={"deleted": deleted})
+    return {"deleted": deleted}
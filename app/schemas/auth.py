@@ -7,10 +7,20 @@ class Login(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str | None = None
+    expires_in: int | None = None
 
 class TokenData(BaseModel):
     user_id: str | None = None
 
+class RefreshTokenIn(BaseModel):
+    refresh_token: str
+
+class CurrentUser(BaseModel):
+    """Identity carried by a valid access token (no database lookup)."""
+    id: int
+    token_version: int
+
 class ForgotPasswordStartIn(BaseModel):
     email: EmailStr
 
@@ -12,3 +12,7 @@ class TeamOut(TeamBase):
 
     class Config:
         from_attributes = True
+
+class TeamSearchOut(BaseModel):
+    items: list[TeamOut]
+    next_cursor: str | None = None
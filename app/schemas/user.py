@@ -10,6 +10,10 @@ class UserOut(UserBase):
     class Config:
         from_attributes = True
 
+class UserProfile(UserOut):
+    two_factor_enabled: bool
+    current_team_id: int | None = None
+
 class UserCreate(BaseModel):
     name: str
     email: EmailStr
@@ -0,0 +1,79 @@
+"""
+Benchmark: full-row vs column-projected queries on the auth paths.
+
+For each path, runs the old (full `User` row) and new (projected / EXISTS) query
+N times against the configured MySQL and reports mean latency, bytes received
+per query (from the session `Bytes_sent` counter) and whether EXPLAIN shows
+an index-only plan ("Using index").
+
+usage:\n
+    python -m benchmarks.auth_queries --email someone@example.com -n 2000
+"""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import exists, select, text
+
+from app.db.session import engine_internal_sync
+from app.models.user import User
+
+CASES = {
+    "login": lambda email: (
+        select(User).where(User.email == email),
+        select(User.id, User.password, User.token_version).where(User.email == email),
+    ),
+    "register (email exists?)": lambda email: (
+        select(User).where(User.email == email),
+        select(exists().where(User.email == email)),
+    ),
+    "forgot-password/start": lambda email: (
+        select(User).where(User.email == email),
+        select(User.id, User.two_factor_enabled).where(User.email == email),
+    ),
+}
+
+
+def _bytes_sent(conn) -> int:
+    return int(conn.execute(text("SHOW SESSION STATUS LIKE 'Bytes_sent'")).one()[1])
+
+
+def _measure(conn, stmt, n: int) -> tuple[float, float]:
+    # Calibra o custo do próprio SHOW STATUS para descontá-lo
+    before = _bytes_sent(conn)
+    overhead = _bytes_sent(conn) - before
+
+    latencies = []
+    before = _bytes_sent(conn)
+    for _ in range(n):
+        started = time.perf_counter()
+        conn.execute(stmt).all()
+        latencies.append(time.perf_counter() - started)
+    received = _bytes_sent(conn) - before - overhead
+    return statistics.mean(latencies) * 1000, received / n
+
+
+def _explain(conn, stmt) -> str:
+    compiled = stmt.compile(engine_internal_sync, compile_kwargs={"literal_binds": True})
+    rows = conn.execute(text(f"EXPLAIN {compiled}")).mappings().all()
+    return "; ".join(f"{r['table']}:{r['key']}:{r['Extra'] or ''}" for r in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--email", required=True, help="email of an existing user")
+    parser.add_argument("-n", type=int, default=1000, help="iterations per query")
+    args = parser.parse_args()
+
+    print(f"{'path':28} {'query':10} {'ms/query':>9} {'bytes/query':>12}  plan")
+    with engine_internal_sync.connect() as conn:
+        for name, build in CASES.items():
+            old, new = build(args.email)
+            for label, stmt in (("full row", old), ("projected", new)):
+                conn.execute(stmt).all()  # aquece o buffer pool
+                ms, size = _measure(conn, stmt, args.n)
+                print(f"{name:28} {label:10} {ms:9.3f} {size:12.1f}  {_explain(conn, stmt)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,18 @@ set -e
 
 case "$1" in
   api)
+    # Métricas multiprocesso: o diretório precisa começar vazio a cada start
+    if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+      rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+    fi
     exec uvicorn app.main:app \
       --host 0.0.0.0 --port 8000 --workers 2
     ;;
   worker)
+    # Pool prefork: as tasks rodam em processos filhos, o exporter (CELERY_METRICS_PORT)
+    # agrega os samples deles por este diretório, separado do da API
+    export PROMETHEUS_MULTIPROC_DIR="${CELERY_PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus-celery}"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
     exec celery -A app.mycelery.app:celery_app worker \
       --loglevel=info --concurrency=2
     ;;
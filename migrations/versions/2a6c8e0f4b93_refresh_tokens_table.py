@@ -0,0 +1,58 @@
+"""refresh tokens table
+
+Revision ID: 2a6c8e0f4b93
+Revises: 5b7e9a3c2d18
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2a6c8e0f4b93'
+down_revision: Union[str, Sequence[str], None] = '5b7e9a3c2d18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Índices da limpeza periódica (purge_refresh_tokens)
+PURGE_INDEXES = (
+    ("ix_refresh_tokens_expires_at", ["expires_at"]),
+    ("ix_refresh_tokens_revoked_at", ["revoked_at"]),
+)
+
+
+def _inspector():
+    # O app roda Base.metadata.create_all no startup, então bancos novos já têm a tabela
+    return sa.inspect(op.get_bind())
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _inspector().has_table("refresh_tokens"):
+        op.create_table(
+            "refresh_tokens",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("jti", sa.String(64), nullable=False),
+            sa.Column("family_id", sa.String(64), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("used_at", sa.DateTime(), nullable=True),
+            sa.Column("revoked_at", sa.DateTime(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+        op.create_index("ix_refresh_tokens_jti", "refresh_tokens", ["jti"], unique=True)
+        op.create_index("ix_refresh_tokens_family_id", "refresh_tokens", ["family_id"])
+        op.create_index("ix_refresh_tokens_user_id", "refresh_tokens", ["user_id"])
+    existing = {ix["name"] for ix in _inspector().get_indexes("refresh_tokens")}
+    for name, columns in PURGE_INDEXES:
+        if name not in existing:
+            op.create_index(name, "refresh_tokens", columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _inspector().has_table("refresh_tokens"):
+        op.drop_table("refresh_tokens")
@@ -0,0 +1,42 @@
+"""auth covering indexes
+
+Revision ID: 3f9a1c2b7d41
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9a1c2b7d41'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    ("ix_password_resets_email_open", "password_resets", ["email", "consumed_at", "id"]),
+    ("ix_password_resets_user_open", "password_resets", ["user_id", "consumed_at", "id"]),
+)
+
+
+def _existing(table: str) -> set[str]:
+    # O app roda Base.metadata.create_all no startup, então bancos novos já têm os índices
+    return {ix["name"] for ix in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, columns in INDEXES:
+        if name not in _existing(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, table, _ in reversed(INDEXES):
+        if name in _existing(table):
+            op.drop_index(name, table_name=table)
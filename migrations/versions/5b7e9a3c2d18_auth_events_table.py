@@ -0,0 +1,48 @@
+"""auth events table
+
+Revision ID: 5b7e9a3c2d18
+Revises: 8c2e4d6f1a36
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b7e9a3c2d18'
+down_revision: Union[str, Sequence[str], None] = '8c2e4d6f1a36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _exists() -> bool:
+    # O app roda Base.metadata.create_all no startup, então bancos novos já têm a tabela
+    return sa.inspect(op.get_bind()).has_table("auth_events")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _exists():
+        return
+    op.create_table(
+        "auth_events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event", sa.String(32), nullable=False),
+        sa.Column("success", sa.Boolean(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("email", sa.String(100), nullable=True),
+        sa.Column("ip", sa.String(64), nullable=True),
+        sa.Column("request_id", sa.String(64), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("ix_auth_events_user_created", "auth_events", ["user_id", "created_at"])
+    op.create_index("ix_auth_events_email_created", "auth_events", ["email", "created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _exists():
+        op.drop_table("auth_events")
@@ -0,0 +1,40 @@
+"""teams user_id name index
+
+Revision ID: 8c2e4d6f1a36
+Revises: 3f9a1c2b7d41
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c2e4d6f1a36'
+down_revision: Union[str, Sequence[str], None] = '3f9a1c2b7d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing() -> dict[str, list[str]]:
+    # O app roda Base.metadata.create_all no startup, então bancos novos já têm o índice
+    return {ix["name"]: ix["column_names"] for ix in sa.inspect(op.get_bind()).get_indexes("teams")}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if "ix_teams_user_id_name" not in _existing():
+        op.create_index("ix_teams_user_id_name", "teams", ["user_id", "name"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    existing = _existing()
+    if "ix_teams_user_id_name" not in existing:
+        return
+    # O MySQL pode ter descartado o índice implícito da FK user_id ao criarmos o composto
+    if not any(cols[:1] == ["user_id"] for name, cols in existing.items() if name != "ix_teams_user_id_name"):
+        op.create_index("ix_teams_user_id", "teams", ["user_id"])
+    op.drop_index("ix_teams_user_id_name", table_name="teams")